@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""Compare generated entity construction against the generic valideer path,
+and bulk loading against constructing in a loop.
+
+Run with ``python benchmarks/construct_bench.py [count]``.
+"""
+import datetime as dt
+import sys
+import timeit
+
+from pytz import utc
+
+from nonobvious import entities, fields
+
+
+class Address(entities.Entity):
+    city = fields.String(required=True)
+    zip = fields.Integer()
+
+
+class Customer(entities.Entity):
+    id = fields.Integer(required=True)
+    name = fields.String(required=True)
+    active = fields.Boolean(default=True)
+    born = fields.Date()
+    seen = fields.DateTime()
+    tags = fields.StringList(default=())
+    address = fields.Embedded(entity=Address)
+
+
+ROW = {
+    'id': 1,
+    'name': 'Bob',
+    'born': dt.date(1970, 1, 2),
+    'seen': dt.datetime(2014, 6, 1, tzinfo=utc),
+    'tags': ['a', 'b'],
+    'address': Address(city='Chicago', zip=60601),
+}
+
+
+def generic():
+    return Customer.get_validator().validate(Customer._merge((ROW,), {}))
+
+
+def generated():
+    return Customer._validate((ROW,), {})
+
+
+def main(count=100000, repeat=5):
+    assert generic() == generated()
+    print "%d constructions, best of %d:" % (count, repeat)
+    for name, case in [('valideer', generic), ('generated', generated),
+                       ('Customer(...)', lambda: Customer(ROW))]:
+        best = min(timeit.repeat(case, number=count, repeat=repeat))
+        print "  %-15s %8.2f us each" % (name, best / count * 1e6)
+
+    rows = [dict(ROW, id=number) for number in xrange(count)]
+    print "%d rows, best of %d:" % (count, repeat)
+    for name, case in [('loop', lambda: [Customer(row) for row in rows]),
+                       ('bulk', lambda: list(Customer.bulk(rows)))]:
+        best = min(timeit.repeat(case, number=1, repeat=repeat))
+        print "  %-15s %8.2f us each" % (name, best / count * 1e6)
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+"""Time importing the package in fresh interpreters.
+
+Run with ``python benchmarks/import_bench.py [repeat]``.
+"""
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CASES = [
+    ('python itself', 'pass'),
+    ('import nonobvious', 'import nonobvious'),
+    ('nonobvious.Entity', 'import nonobvious; nonobvious.Entity'),
+    ('import funk', 'import nonobvious.funk'),
+]
+
+
+def time_source(source, repeat):
+    best = None
+    for _ in xrange(repeat):
+        started = time.time()
+        subprocess.check_call([sys.executable, '-c', source], cwd=ROOT)
+        elapsed = time.time() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main(repeat=10):
+    print "Fresh interpreter startup, best of %d:" % repeat
+    for name, source in CASES:
+        print "  %-20s %8.2f ms" % (name, time_source(source, repeat) * 1000)
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+"""Compare the per-instance memory of each Entity flavor.
+
+Most members are left at their defaults, which only `SparseEntity` avoids
+storing. "Owned" counts an instance and the top-level container it keeps,
+not the member values, which all flavors share; "RSS" is the growth in peak
+resident memory per instance, measured in a separate process for each
+flavor (so it also counts e.g. the trie nodes of a `PersistentEntity`).
+
+Run with ``python benchmarks/memory_bench.py [count]``.
+"""
+import os
+import resource
+import sys
+
+from nonobvious import entities, fields
+
+
+def define(base):
+    class Settings(base):
+        id = fields.Integer(required=True)
+        name = fields.String(required=True)
+        enabled = fields.Boolean(default=True)
+        retries = fields.Integer(default=3)
+        timeout = fields.Integer(default=30)
+        region = fields.String(default='us')
+        owner = fields.String(default='')
+        notes = fields.String(default='')
+        priority = fields.Integer(default=0)
+        tags = fields.StringList(default=())
+
+    Settings.__name__ = base.__name__
+    return Settings
+
+
+FLAVORS = [define(base) for base in [
+    entities.Entity, entities.PersistentEntity, entities.CompactEntity,
+    entities.SparseEntity]]
+
+
+def owned_size(entity):
+    """Return the bytes held by an entity and the containers it owns.
+    """
+    size = sys.getsizeof(entity)
+    for name in ['_data', '_values']:
+        container = getattr(entity, name, None)
+        if container is not None and container is not getattr(type(entity), name, None):
+            size += sys.getsizeof(container)
+    return size
+
+
+def rss_growth(cls, count):
+    """Return the growth in peak RSS, in kB, from building `count` instances
+    in a child process.
+    """
+    read, write = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        instances = [cls(id=number, name='settings') for number in xrange(count)]
+        after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        os.write(write, str(after - before))
+        os._exit(0)
+    os.close(write)
+    growth = int(os.read(read, 64))
+    os.close(read)
+    os.waitpid(pid, 0)
+    return growth
+
+
+def main(count=100000):
+    print "%d instances, 2 of 10 members set:" % count
+    print "  %-17s %12s %12s" % ('flavor', 'owned bytes', 'RSS bytes')
+    for cls in FLAVORS:
+        entity = cls(id=0, name='settings')
+        growth = rss_growth(cls, count) * 1024.0 / count
+        print "  %-17s %12d %12.0f" % (cls.__name__, owned_size(entity), growth)
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+"""Compare queries against the equivalent funk chains.
+
+Run with ``python benchmarks/query_bench.py [count]``.
+"""
+import sys
+import timeit
+
+from nonobvious import entities, fields, funk
+from nonobvious.indexes import IndexedCollection
+from nonobvious.query import Query
+
+
+class BenchEntity(entities.Entity):
+    id = fields.Integer(required=True)
+    color = fields.String()
+    size = fields.Integer()
+
+
+def build(count):
+    return [
+        BenchEntity.trusted(id=n, color=['red', 'green', 'blue'][n % 3], size=n % 100)
+        for n in xrange(count)
+    ]
+
+
+def funk_chain(people):
+    return list(funk.filter(
+        lambda e: funk.gt(90, e.size) and funk.eq('red', e.color),
+        people
+    ))
+
+
+def funk_map_chain(people):
+    return list(funk.map(funk.get_attr('id'), funk.filter(
+        funk.compose(funk.gt(90), funk.get_attr('size')),
+        people
+    )))
+
+
+def main(count=100000, repeat=5):
+    people = build(count)
+    collection = IndexedCollection(BenchEntity, people, hashed=['color'], ordered=['size'])
+    expected = funk_chain(people)
+    cases = [
+        ('funk filter', lambda: funk_chain(people)),
+        ('query over list', lambda: list(Query(people).where(size__gt=90, color='red'))),
+        ('query over indexes', lambda: list(Query(collection).where(size__gt=90, color='red'))),
+        ('funk map/filter', lambda: funk_map_chain(people)),
+        ('query map', lambda: [e.id for e in Query(people).where(size__gt=90)]),
+    ]
+    assert sorted(Query(collection).where(size__gt=90, color='red')) == sorted(expected)
+
+    print "%d entities, best of %d:" % (count, repeat)
+    for name, case in cases:
+        best = min(timeit.repeat(case, number=1, repeat=repeat))
+        print "  %-20s %8.2f ms" % (name, best * 1000)
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -2,10 +2,59 @@
 """nonobvious package
 
 The first Python package to tunnel to Java!
+
+The names exported here are imported lazily, on first access, so that
+importing the package itself is cheap.
 """
-from .entities import *
-from .fields import *
-import valideer as V
-from valideer import parse as get_validator
-from valideer import accepts, adapts
-from concon import frozendict, frozenlist, frozenset
+import importlib
+import sys
+from types import ModuleType
+
+# Exported name -> (module, attribute); an attribute of None is the module.
+_EXPORTS = {
+    'entities': ('nonobvious.entities', None),
+    'fields': ('nonobvious.fields', None),
+    'V': ('valideer', None),
+    'get_validator': ('valideer', 'parse'),
+    'accepts': ('valideer', 'accepts'),
+    'adapts': ('valideer', 'adapts'),
+    'frozendict': ('concon', 'frozendict'),
+    'frozenlist': ('concon', 'frozenlist'),
+    'frozenset': ('concon', 'frozenset'),
+}
+for _name in ['BaseEntity', 'CompactEntity', 'Entity', 'MappingEntity',
+              'PersistentEntity', 'SparseEntity', 'ConstraintError',
+              'ValidationError']:
+    _EXPORTS[_name] = ('nonobvious.entities', _name)
+for _name in ['Boolean', 'Computed', 'Embedded', 'Date', 'DateTime', 'Field',
+              'Integer', 'IntegerList', 'LazyEntity', 'ListField', 'NIL',
+              'String', 'StringList', 'TimeZoneAwareField', 'Time', 'computed']:
+    _EXPORTS[_name] = ('nonobvious.fields', _name)
+del _name
+
+__all__ = sorted(_EXPORTS)
+
+
+class LazyModule(ModuleType):
+    """A module whose exported names are imported on first access.
+    """
+    def __getattr__(self, name):
+        try:
+            module_name, attribute = _EXPORTS[name]
+        except KeyError:
+            raise AttributeError("'module' object has no attribute %r" % name)
+        value = importlib.import_module(module_name)
+        if attribute is not None:
+            value = getattr(value, attribute)
+        setattr(self, name, value)
+        return value
+
+    def __dir__(self):
+        return sorted(set(self.__dict__) | set(_EXPORTS))
+
+
+_module = sys.modules[__name__]
+_lazy = sys.modules[__name__] = LazyModule(__name__, __doc__)
+_lazy.__dict__.update(_module.__dict__)
+# The original module must outlive this one: its globals back LazyModule.
+_lazy._module = _module
@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+"""nonobvious.bulk -- Streaming construction of many entities at once.
+"""
+from collections import deque, namedtuple
+from itertools import islice
+import Queue
+import time
+
+from valideer import ValidationError
+
+__all__ = ['BulkLoader', 'RowError']
+
+
+RowError = namedtuple('RowError', ('index', 'row', 'error'))
+
+
+def _validate_chunk(task):
+    """Validate a chunk of rows in a worker process.
+
+    Returns ``(start, loaded, errors)``, where `loaded` holds
+    ``(index, data)`` for each valid row, with `data` the validated dict less
+    any members that are still the class's defaults, and `errors` holds
+    ``(index, message, value, context)`` for each invalid one.
+    """
+    class_name, start, rows = task
+    from .entities import BaseEntity
+    entity_class = BaseEntity.entities[class_name]
+    entity_class.get_validator()
+    validate = entity_class._validate
+    defaults = entity_class._defaults
+    loaded = []
+    errors = []
+    for index, row in enumerate(rows, start):
+        try:
+            data = validate((row,), {})
+            loaded.append((index, dict(
+                (key, value) for key, value in data.iteritems()
+                if not (key in defaults and value is defaults[key])
+            )))
+        except ValidationError as ex:
+            errors.append((index, ex.msg, ex.value, ex.context))
+    return start, loaded, errors
+
+
+class BulkLoader(object):
+    """Lazily build and validate entities of one class from an iterable of rows.
+
+    The class's generated validation code (see `nonobvious.constructors`) and
+    instance factory are looked up once per batch instead of once per row.
+    Iterate over the loader to get the entities; counters are kept up to date
+    as you go.
+
+    If `collect_errors` is true, rows that fail validation are skipped and
+    recorded in `errors` as `RowError`s instead of raising.
+
+    If `trusted` is true, rows are taken to be valid already and are only
+    validated as sampled by the entity class (see `Entity.trusted`).
+
+    If `processes` is given, untrusted rows are validated in a pool of that
+    many worker processes, `chunk_size` rows at a time. Rows go to the
+    workers as plain dicts and come back validated and adapted, less any
+    members left at their defaults, so both must pickle. Entities are
+    produced in input order, unless `ordered` is false, in which case each
+    chunk is produced as soon as it is done. Workers find the entity class by
+    name, so it must be the class registered under its name when the loader
+    starts.
+    """
+    def __init__(self, entity_class, rows, collect_errors=False, trusted=False,
+                 processes=None, chunk_size=1000, ordered=True):
+        self.entity_class = entity_class
+        self.rows = rows
+        self.collect_errors = collect_errors
+        self.trusted = trusted
+        self.processes = processes
+        self.chunk_size = chunk_size
+        self.ordered = ordered
+        self.errors = []
+        self.read = 0
+        self.loaded = 0
+        self.failed = 0
+        self.elapsed = 0.0
+
+    @property
+    def rate(self):
+        """Rows processed per second so far.
+        """
+        if not self.elapsed:
+            return 0.0
+        return self.read / self.elapsed
+
+    def get_defaults(self):
+        """Return the default values merged into every row.
+        """
+        self.entity_class.get_validator()  # Adapts the defaults, if not done yet.
+        return dict(self.entity_class._defaults)
+
+    def __iter__(self):
+        if self.processes and not self.trusted:
+            return self._iter_parallel()
+        return self._iter_serial()
+
+    def _iter_serial(self):
+        defaults = self.get_defaults()
+        self.entity_class.get_validator()
+        validate = self.entity_class._validate
+        build = self.entity_class._from_validated
+        collect_errors = self.collect_errors
+        errors = self.errors
+        trusted = self.trusted
+        should_sample = self.entity_class.should_sample_trusted
+        intern = self.entity_class.intern if self.entity_class.interned else None
+        clock = time.time
+
+        started = clock()
+        try:
+            for index, row in enumerate(self.rows, self.read):
+                self.read = index + 1
+                try:
+                    if trusted and not should_sample():
+                        data = dict(defaults)
+                        data.update(row)
+                        entity = build(data)
+                    else:
+                        entity = build(validate((row,), {}))
+                except ValidationError as ex:
+                    self.failed += 1
+                    if not collect_errors:
+                        raise
+                    errors.append(RowError(index, row, ex))
+                    continue
+                if intern is not None:
+                    entity = intern(entity)
+                self.loaded += 1
+                yield entity
+        finally:
+            self.elapsed += clock() - started
+
+    def _iter_parallel(self):
+        from multiprocessing import Pool
+
+        entity_class = self.entity_class
+        class_name = entity_class.__name__
+        if entity_class.entities.get(class_name) is not entity_class:
+            raise ValueError(
+                "%s is not the entity class registered under its name." % class_name)
+        defaults = self.get_defaults()
+        build = entity_class._from_validated
+        intern = entity_class.intern if entity_class.interned else None
+        rows = iter(self.rows)
+        window = self.processes * 2
+        pending = {}  # start index -> (rows, async result)
+        order = deque()
+        done = Queue.Queue()
+        callback = None if self.ordered else done.put
+
+        started = time.time()
+        pool = Pool(self.processes)
+        try:
+            while True:
+                while len(pending) < window:
+                    chunk = list(islice(rows, self.chunk_size))
+                    if not chunk:
+                        break
+                    task = (class_name, self.read, [dict(row) for row in chunk])
+                    result = pool.apply_async(_validate_chunk, (task,), callback=callback)
+                    pending[self.read] = (chunk, result)
+                    order.append(self.read)
+                    self.read += len(chunk)
+                if not pending:
+                    break
+
+                if self.ordered:
+                    start = order.popleft()
+                    start, loaded, errors = pending[start][1].get()
+                else:
+                    start, loaded, errors = self._next_done(pending, done)
+                chunk = pending.pop(start)[0]
+
+                failures = {}
+                for index, message, value, context in errors:
+                    error = failures[index] = ValidationError(message, value)
+                    error.context = context
+                failed = deque(sorted(failures))
+                for index, changed in loaded:
+                    while failed and failed[0] < index:
+                        failed_index = failed.popleft()
+                        self._fail(failed_index, failures[failed_index],
+                                   chunk[failed_index - start])
+                    data = dict(defaults)
+                    data.update(changed)
+                    try:
+                        entity = build(data)
+                    except ValidationError as ex:
+                        self._fail(index, ex, chunk[index - start])
+                        continue
+                    if intern is not None:
+                        entity = intern(entity)
+                    self.loaded += 1
+                    yield entity
+                for index in failed:
+                    self._fail(index, failures[index], chunk[index - start])
+        finally:
+            pool.terminate()
+            pool.join()
+            self.elapsed += time.time() - started
+
+    @staticmethod
+    def _next_done(pending, done):
+        """Wait for any chunk to finish, re-raising errors from workers.
+        """
+        while True:
+            try:
+                return done.get(timeout=0.1)
+            except Queue.Empty:
+                for chunk, result in pending.itervalues():
+                    if result.ready() and not result.successful():
+                        result.get()
+
+    def _fail(self, index, error, row):
+        self.failed += 1
+        if not self.collect_errors:
+            raise error
+        self.errors.append(RowError(index, row, error))
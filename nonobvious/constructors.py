@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+"""nonobvious.constructors -- Generated validation code for Entity classes.
+
+Each Entity class gets its own `_validate`, generated from its fields and
+compiled with ``exec``, which merges defaults, arguments and keywords and
+validates the result in one flat function. Checks for the built-in field
+types are written inline as plain type tests; a value that fails them (or
+belongs to a field with a custom validator or choices) is handed to the
+field's valideer validator, which adapts it or raises the usual error.
+Results are the same as validating with the class's `validation_spec`.
+"""
+import datetime as dt
+
+from valideer import Nullable, ValidationError
+
+from . import fields
+
+__all__ = ['compile_validate']
+
+
+def _inline_check(field, number, names):
+    """Return a python expression testing `v` for the field, or None.
+
+    `names` maps names used in the expression to objects it needs.
+    """
+    if field.custom_validator is not None or field.choices is not None:
+        return None
+    kind = type(field)
+    if kind is fields.Field:
+        return 'True'
+    elif kind is fields.Boolean:
+        return 'v is True or v is False'
+    elif kind is fields.Integer:
+        return 'type(v) is int or type(v) is long'
+    elif kind is fields.String:
+        return 'type(v) is str or type(v) is unicode'
+    elif kind is fields.Date:
+        return 'isinstance(v, date)'
+    elif kind in (fields.DateTime, fields.Time):
+        names['datetime'] = dt.datetime
+        names['time'] = dt.time
+        names['has_tzinfo'] = fields.TimeZoneAwareField.has_tzinfo
+        check = 'isinstance(v, %s)' % ('datetime' if kind is fields.DateTime else 'time')
+        if not field.naive_ok:
+            check += ' and has_tzinfo(v)'
+        return check
+    elif kind is fields.Embedded and not field.lazy:
+        names['E%d' % number] = field.entity
+        return 'isinstance(v, E%d)' % number
+    return None
+
+
+LIST_ITEM_CHECKS = {
+    fields.StringList: 'type(i) is str or type(i) is unicode',
+    fields.IntegerList: 'type(i) is int or type(i) is long',
+}
+
+
+def compile_validate(cls):
+    """Generate the `_validate` classmethod for an Entity class.
+
+    Must only be called once all of the class's fields are resolved.
+    """
+    names = {
+        'ValidationError': ValidationError,
+        'date': dt.date,
+    }
+    defaults = []
+    required = []
+    body = []
+    fills = []
+    for number, (key, field) in enumerate(sorted(cls.fields.iteritems())):
+        validator = field.get_validator()
+        names['K%d' % number] = key
+        names['V%d' % number] = validator.validate
+        if isinstance(validator, Nullable) and validator._default is not None:
+            # Like valideer's Object, fill in a missing member's Nullable
+            # default, unvalidated.
+            names['N%d' % number] = validator
+            fills.extend([
+                '    if K%d not in data:' % number,
+                '        data[K%d] = N%d.default' % (number, number),
+            ])
+        if field.default is not fields.NIL:
+            names['D%d' % number] = cls._defaults[key]
+            defaults.append('K%d: D%d' % (number, number))
+        if field.required:
+            required.append(key)
+
+        fallback = [
+            '            try:',
+            '                data[K%d] = V%d(v)' % (number, number),
+            '            except ValidationError as ex:',
+            '                raise ex.add_context(K%d)' % number,
+        ]
+        check = _inline_check(field, number, names)
+        item_check = LIST_ITEM_CHECKS.get(type(field))
+        if check == 'True':
+            continue
+        body.append('    if K%d in data:' % number)
+        body.append('        v = data[K%d]' % number)
+        if check is not None:
+            body.append('        if not (%s):' % check)
+            body.extend(fallback)
+        elif item_check is not None and field.custom_validator is None and field.choices is None:
+            names['C%d' % number] = field.container
+            # Items that pass the type check may still not fit a compact
+            # container; the validator then reports the problem.
+            body.extend([
+                '        if not (type(v) is C%d and all(%s for i in v)):' % (number, item_check),
+                '            try:',
+                '                if (type(v) is list or type(v) is tuple) and all(%s for i in v):' % item_check,
+                '                    try:',
+                '                        data[K%d] = C%d(v)' % (number, number),
+                '                    except (TypeError, ValueError, OverflowError):',
+                '                        data[K%d] = V%d(v)' % (number, number),
+                '                else:',
+                '                    data[K%d] = V%d(v)' % (number, number),
+                '            except ValidationError as ex:',
+                '                raise ex.add_context(K%d)' % number,
+            ])
+        else:
+            body.extend(line[4:] for line in fallback)
+
+    lines = [
+        'def _validate(cls, args, kwargs):',
+        '    data = {%s}' % ', '.join(defaults),
+        '    for arg in args:',
+        '        data.update(arg)',
+        '    if kwargs:',
+        '        data.update(kwargs)',
+    ]
+    if required:
+        names['REQUIRED'] = frozenset(required)
+        lines.extend([
+            '    if not (%s):' % ' and '.join('%r in data' % key for key in required),
+            '        raise ValidationError("missing required properties: %s" %',
+            '                              list(REQUIRED.difference(data)), data)',
+        ])
+    lines.extend(body)
+    lines.extend(fills)
+    lines.append('    return data')
+
+    source = '\n'.join(lines)
+    code = compile(source, '<%s._validate>' % cls.__name__, 'exec')
+    exec code in names
+    function = names['_validate']
+    function.source = source
+    return classmethod(function)
@@ -1,79 +1,788 @@
 # -*- coding: utf-8 -*-
 """nonobvious.entities
 """
+from collections import Mapping
+import random
+import weakref
+
 from concon import frozendict, ConstraintError
 from valideer import ValidationError
 import valideer
 
 from . import fields
+from .bulk import BulkLoader
+from .constructors import compile_validate
+from . import patches
+from .persistent import PersistentMap
+from .primitives import get_codec
+from .transients import Transient
+
+__all__ = ['BaseEntity', 'CompactEntity', 'Entity', 'MappingEntity',
+           'PersistentEntity', 'SparseEntity', 'ConstraintError',
+           'ValidationError']
+
+
+def hash_value(value):
+    """Hash a member value, hashing lists and mappings by their contents.
+    """
+    try:
+        return hash(value)
+    except TypeError:
+        if isinstance(value, (list, tuple)):
+            return hash(tuple(hash_value(item) for item in value))
+        elif isinstance(value, Mapping):
+            return hash(frozenset((key, hash_value(item)) for key, item in value.iteritems()))
+        raise
+
 
-__all__ = ['Entity', 'ConstraintError', 'ValidationError']
+def freeze_value(value):
+    """Return a hashable stand-in for a member value, for use as a key.
+
+    Lists and mappings are frozen by their contents; two frozen values are
+    only equal if the values they stand in for are.
+    """
+    try:
+        hash(value)
+        return value
+    except TypeError:
+        if isinstance(value, list):
+            return (list, tuple(freeze_value(item) for item in value))
+        elif isinstance(value, tuple):
+            return (tuple, tuple(freeze_value(item) for item in value))
+        elif isinstance(value, Mapping):
+            return (Mapping, frozenset(
+                (key, freeze_value(item)) for key, item in value.iteritems()))
+        raise
+
+
+def _unpickle(class_name, data):
+    """Rebuild a pickled entity of the class registered under `class_name`.
+    """
+    return BaseEntity.entities[class_name]._from_validated(data)
+
+
+#: Class settings, which fields and computed values can't be named after.
+SETTINGS = ('trusted_sample_rate', 'interned', 'intern_limit')
 
 
 class EntityMeta(type):
     def __new__(cls, name, bases, attrs):
         _new = attrs.pop('__new__', None)
         new_attrs = {'__new__': _new} if _new is not None else {}
+        abstract = attrs.pop('__abstract__', False)
+        slots = attrs.pop('__slots__', None)
+        if slots is None and not abstract and all('__slots__' in vars(base) for base in bases):
+            # Implementations of a slotted storage flavor stay slotted.
+            slots = ()
+        if slots is not None:
+            new_attrs['__slots__'] = slots
         new_class = super(EntityMeta, cls).__new__(cls, name, bases, new_attrs)
 
-        if not hasattr(new_class, 'entities'):
-            # This branch only executes when processing the base class itself.
-            # So, since this is a new base class, not an implementation, this
-            # class shouldn't be registered as an implementation. Instead, it
+        if not hasattr(new_class, 'entities') or abstract:
+            # This branch only executes when processing the base class itself,
+            # or one of the abstract storage flavors derived from it. So, since
+            # this is a new base class, not an implementation, this class
+            # shouldn't be registered as an implementation. Instead, the root
             # sets up a dict where implementations can be registered later.
-            new_class.entities = {}
+            if not hasattr(new_class, 'entities'):
+                new_class.entities = {}
             for name, value in attrs.items():
                 setattr(new_class, name, value)
         else:
             # This must be a model implementation, which should be registered.
             # Then it gets its own fields record.
+            for attr in SETTINGS:
+                if isinstance(attrs.get(attr), (fields.Field, fields.Computed)):
+                    raise TypeError(
+                        "%s.%s: %r is a class setting, not a valid member name."
+                        % (name, attr, attr))
             new_class.entities[name] = new_class
             new_class.fields = {}
+            new_class.computed = {}
 
-            validation_spec = []
             for name, value in attrs.items():
                 if isinstance(value, fields.Field):
                     value.key = name
                     new_class.fields[name] = value
-                    validation_spec.append(value.validation_spec)
+                elif isinstance(value, fields.Computed):
+                    value.key = name
+                    new_class.computed[name] = value
                 setattr(new_class, name, value)
-            new_class.validation_spec = frozendict(validation_spec)
-        return new_class
+            # Defaults are adapted along with compiling the validator; until
+            # then, they are kept as given.
+            new_class._defaults = dict(
+                (name, field.default)
+                for name, field in new_class.fields.iteritems()
+                if field.default is not fields.NIL
+            )
+            new_class._prepare_class()
 
+            # Compile the validator once, up front. Embedded fields that
+            # refer to entities not yet defined by name postpone compilation
+            # until the validator is first needed (see `get_validator`).
+            new_class.validation_spec = None
+            new_class._validator = None
+            if all(f.resolved for f in new_class.fields.itervalues()):
+                new_class.get_validator()
+            else:
+                # Don't run a parent implementation's generated code meanwhile.
+                new_class._validate = BaseEntity.__dict__['_validate']
+        return new_class
 
-class Entity(frozendict):
-    """A Entity is simply a read-only dict with a light dusting of magic.
+    def __call__(cls, *args, **kwargs):
+        entity = super(EntityMeta, cls).__call__(*args, **kwargs)
+        if cls.interned:
+            entity = cls.intern(entity)
+        return entity
 
-    The Entity can be subclassed to add fields from ``nonobvious.fields``
-    (similar to Django models).
 
-    Entity instances provide copy-on-write functionality via the `copy` method.
+class BaseEntity(object):
+    """The root of all Entity classes, whatever their storage.
 
+    Provides field-driven validation and copy-on-write; subclasses decide how
+    the validated data is stored by implementing `_from_validated`.
     """
     __metaclass__ = EntityMeta
+    __slots__ = ()
     ConstraintError = ConstraintError
     ValidationError = ValidationError
 
-    def __init__(self, *args, **kwargs):
-        data = {}
-        for name, field in self.fields.iteritems():
-            if name not in kwargs and field.default is not fields.NIL:
-                data[name] = field.default
+    #: Fraction (0 to 1) of trusted constructions that are fully validated
+    #: anyway. Raise it while debugging to catch bad "trusted" data.
+    trusted_sample_rate = 0.0
+
+    #: Set to True to share one instance among all equal, live instances.
+    #: See `intern`.
+    interned = False
+
+    #: The most distinct instances to keep in the intern table.
+    intern_limit = 100000
+
+    @classmethod
+    def _prepare_class(cls):
+        """Hook called once an implementation's fields have been collected.
+        """
+
+    @classmethod
+    def get_validator(cls):
+        """Return the compiled validator for this Entity class.
+
+        The validator is compiled from `validation_spec` when the class is
+        created, or on first use if an Embedded field names an entity that
+        was not yet defined at that time. Call this to inspect or warm it.
+        The class's own `_validate` is generated at the same time.
+        """
+        validator = cls._validator
+        if validator is None:
+            cls.validation_spec = frozendict(
+                field.validation_spec for field in cls.fields.itervalues()
+            )
+            validator = cls._validator = valideer.parse(cls.validation_spec)
+            # Defaults come from the class, so they are adapted just once.
+            cls._defaults = dict(
+                (name, field.get_default())
+                for name, field in cls.fields.iteritems()
+                if field.default is not fields.NIL
+            )
+            cls._validate = compile_validate(cls)
+        return validator
+
+    @classmethod
+    def bulk(cls, rows, collect_errors=False, trusted=False, **options):
+        """Return a `BulkLoader` that lazily builds instances from `rows`.
+
+        Use this rather than calling the class in a loop for large imports.
+        Pass `processes` (and optionally `chunk_size` and `ordered`) to
+        validate in parallel; see `BulkLoader`.
+        """
+        return BulkLoader(cls, rows, collect_errors=collect_errors, trusted=trusted, **options)
+
+    @classmethod
+    def trusted(cls, *args, **kwargs):
+        """Build an instance from data known to be valid, skipping validation.
+
+        Defaults are merged as usual, but no validators or adaptors are run,
+        so values must already be in their adapted form (embedded entities,
+        frozenlists, etc.). Only use this for data you produced yourself.
+        See `trusted_sample_rate`.
+        """
+        if cls.should_sample_trusted():
+            return cls(*args, **kwargs)
+        cls.get_validator()  # Adapts the defaults, if not done yet.
+        entity = cls._from_validated(cls._merge(args, kwargs))
+        if cls.interned:
+            entity = cls.intern(entity)
+        return entity
+
+    @classmethod
+    def intern(cls, entity):
+        """Return the live instance equal to `entity`, if any, else `entity`.
+
+        Instances are remembered weakly, so the table only holds entities that
+        are in use elsewhere; once `intern_limit` are held, new values are
+        returned as is. Lists and mappings are compared by their contents;
+        entities with other unhashable members are never interned.
+        """
+        table = cls.__dict__.get('_intern_table')
+        if table is None:
+            table = cls._intern_table = weakref.WeakValueDictionary()
+        try:
+            key = frozenset((name, freeze_value(item)) for name, item in entity.iteritems())
+        except TypeError:
+            return entity
+        interned = table.get(key)
+        if interned is not None:
+            return interned
+        if len(table) < cls.intern_limit:
+            table[key] = entity
+        return entity
+
+    @classmethod
+    def should_sample_trusted(cls):
+        """Decide whether a trusted construction should be validated anyway.
+        """
+        rate = cls.trusted_sample_rate
+        return bool(rate) and random.random() < rate
+
+    @classmethod
+    def _merge(cls, args, kwargs):
+        """Merge defaults, positional mappings and keywords into a new dict.
+        """
+        data = dict(cls._defaults)
         for arg in args:
             data.update(arg)
         data.update(kwargs)
-        validator = valideer.parse(self.validation_spec)
-        super(Entity, self).__init__(validator.validate(data))
+        return data
+
+    @classmethod
+    def _validate(cls, args, kwargs):
+        """Merge defaults, positional mappings and keywords, then validate.
+
+        Each implementation replaces this with code generated for its fields
+        (see `nonobvious.constructors`) once its validator is compiled.
+        """
+        validator = cls.get_validator()
+        if '_validate' in cls.__dict__:
+            return cls._validate(args, kwargs)
+        return validator.validate(cls._merge(args, kwargs))
+
+    @classmethod
+    def _validate_changes(cls, changes):
+        """Validate only the given members, returning their adapted values.
+
+        Members that are not fields are passed through, just as the
+        validation spec allows additional properties.
+        """
+        fields = cls.fields
+        validated = {}
+        for key, value in changes.iteritems():
+            field = fields.get(key)
+            if field is not None:
+                try:
+                    value = field.get_validator().validate(value)
+                except ValidationError as ex:
+                    raise ex.add_context(key)
+            validated[key] = value
+        return validated
+
+    @classmethod
+    def _from_validated(cls, data):
+        """Build an instance from data that has already passed validation.
+        """
+        raise NotImplementedError
+
+    def _evolve(self, changes):
+        """Return a new instance with the already-validated changes applied.
+        """
+        data = dict(self)
+        data.update(changes)
+        return self._from_validated(data)
 
     def copy(self, *args, **kwargs):
         """Return a shallow copy, optionally with updated members as specified.
 
-        Updated members must pass validation.
+        Updated members must pass validation. Members carried over from this
+        entity have already been validated and are not checked again.
+        """
+        changes = {}
+        for arg in args:
+            changes.update(arg)
+        changes.update(kwargs)
+        changes = self._validate_changes(changes)
+        entity = self._evolve(changes)
+        self._carry_computed(entity, changes)
+        if self.interned:
+            entity = self.intern(entity)
+        return entity
+
+    def set_in(self, path, value):
+        """Return a copy with the member at `path` replaced by `value`.
+
+        `path` is a sequence of keys leading through embedded entities, e.g.
+        ``order.set_in(['customer', 'address', 'city'], 'Chicago')``. Only the
+        entities along the path are rebuilt, and only the new value is
+        validated; everything else is shared with this entity. If the member
+        already holds `value`, this entity itself is returned.
+        """
+        return self._change_in(path, lambda entity, key: value)
+
+    def update_in(self, path, function, *args, **kwargs):
+        """Return a copy with the member at `path` replaced by the result of
+        calling `function` with its current value and any other arguments.
+
+        See `set_in`. The member must be present.
+        """
+        return self._change_in(
+            path, lambda entity, key: function(entity[key], *args, **kwargs))
+
+    def _change_in(self, path, change):
+        if isinstance(path, basestring):
+            path = (path,)
+        if not path:
+            raise ValueError("An empty path can't name a member.")
+        key = path[0]
+        if len(path) == 1:
+            value = change(self, key)
+            current = self.get(key, fields.NIL)
+            if current is value or (type(current) is type(value) and current == value):
+                # Unchanged, so the entities along the path can be kept too.
+                return self
+            return self.copy({key: value})
+        child = self[key]
+        if isinstance(child, fields.LazyEntity):
+            child = child.materialize()
+        if not isinstance(child, BaseEntity):
+            raise TypeError("Member %r is not an embedded entity." % (key,))
+        try:
+            changed = child._change_in(path[1:], change)
+        except ValidationError as ex:
+            raise ex.add_context(key)
+        if changed is child:
+            return self
+        return self.copy({key: changed})
+
+    def transient(self):
+        """Return a mutable draft of this entity, to change many members at once.
+
+        Changes made to the draft are validated together by its `freeze`,
+        which returns the new entity. See `nonobvious.transients`.
+        """
+        return Transient(self)
+
+    def _carry_computed(self, entity, changes):
+        """Give a copy the computed values whose dependencies didn't change.
+        """
+        try:
+            cache = self._computed
+        except AttributeError:
+            return
+        changed = set(
+            key for key, value in changes.iteritems()
+            if key not in self or not (self[key] is value or self[key] == value)
+        )
+        carried = {}
+        for name, value in cache.iteritems():
+            depends = self.computed[name].depends
+            if depends is not None and depends.isdisjoint(changed):
+                carried[name] = value
+        if carried:
+            entity._computed = carried
+
+    def validate(self):
+        """Build and validate all lazily embedded entities now; return self.
+
+        Embedded fields marked `lazy` only build their entity when first
+        read. Call this to surface any validation errors up front instead.
+        """
+        for key, value in self.iteritems():
+            try:
+                if isinstance(value, fields.LazyEntity):
+                    value = value.materialize()
+                if isinstance(value, BaseEntity):
+                    value.validate()
+            except ValidationError as ex:
+                raise ex.add_context(key)
+        return self
+
+    @classmethod
+    def get_codec(cls):
+        """Return the `EntityCodec` for this class, compiling it on first use.
+        """
+        return get_codec(cls)
+
+    def to_primitive(self):
+        """Return a primitive dict (as for JSON) holding this entity's members.
+        """
+        return get_codec(self.__class__).encode(self)
+
+    @classmethod
+    def from_primitive(cls, data, trusted=False):
+        """Build an instance from a primitive dict, as made by `to_primitive`.
+
+        The result is validated unless `trusted` is true.
+        """
+        return get_codec(cls).decode(data, trusted)
+
+    def diff(self, other):
+        """Return the patch that turns this entity into `other`.
+
+        See `nonobvious.patches` for the format.
+        """
+        return patches.diff(self, other)
+
+    def patch(self, changes):
+        """Return a new version of this entity with the patch applied.
+
+        Only the members the patch touches are validated.
+        """
+        return patches.patch(self, changes)
+
+    def __reduce__(self):
+        """Pickle by registered class name, like `BulkLoader`'s workers, so
+        that classes needn't be importable by module path.
         """
-        return self.__class__(self, *args, **kwargs)
+        return (_unpickle, (self.__class__.__name__, dict(self.iteritems())))
+
+    def __hash__(self):
+        """Hash by content. Entities are immutable, so this is done only once.
+        """
+        try:
+            return self._hash
+        except AttributeError:
+            pass
+        value = self._hash = hash(frozenset(
+            (key, hash_value(item)) for key, item in self.iteritems()
+        ))
+        return value
+
+    def __eq__(self, other):
+        if self is other:
+            return True
+        if isinstance(other, BaseEntity):
+            if other.__class__ is not self.__class__:
+                return False
+            try:
+                if self._hash != other._hash:
+                    return False
+            except AttributeError:
+                pass
+        return self._eq_data(other)
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        if equal is NotImplemented:
+            return equal
+        return not equal
+
+    def _eq_data(self, other):
+        """Compare this entity's members with another mapping's.
+        """
+        raise NotImplementedError
+
+
+class Entity(BaseEntity, frozendict):
+    """A Entity is simply a read-only dict with a light dusting of magic.
+
+    The Entity can be subclassed to add fields from ``nonobvious.fields``
+    (similar to Django models).
+
+    Entity instances provide copy-on-write functionality via the `copy` method.
+
+    """
+    __abstract__ = True
+    __slots__ = ('_hash', '_computed')
+
+    def __init__(self, *args, **kwargs):
+        super(Entity, self).__init__(self._validate(args, kwargs))
+
+    _eq_data = frozendict.__eq__
+
+    @classmethod
+    def _from_validated(cls, data):
+        entity = cls.__new__(cls)
+        frozendict.__init__(entity, data)
+        return entity
 
     def __repr__(self):
         return "{}({})".format(
             self.__class__.__name__,
             super(Entity, self).__repr__()
         )
+
+
+class MappingEntity(BaseEntity):
+    """An Entity that keeps its data in something other than a dict.
+
+    MappingEntity instances are read-only `collections.Mapping`s. Subclasses
+    store the validated data by implementing `_init_data`; by default the
+    Mapping API is served from whatever mapping they keep in `_data`.
+    """
+    __abstract__ = True
+    __slots__ = ()
+
+    def __init__(self, *args, **kwargs):
+        self._init_data(self._validate(args, kwargs))
+
+    def _init_data(self, data):
+        raise NotImplementedError
+
+    @classmethod
+    def _from_validated(cls, data):
+        entity = cls.__new__(cls)
+        entity._init_data(data)
+        return entity
+
+    def __getitem__(self, key):
+        return self._data[key]
+
+    def __iter__(self):
+        return iter(self._data)
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def get(self, key, default=None):
+        return self._data.get(key, default)
+
+    def iterkeys(self):
+        return iter(self)
+
+    def itervalues(self):
+        for key in self:
+            yield self[key]
+
+    def iteritems(self):
+        for key in self:
+            yield (key, self[key])
+
+    def keys(self):
+        return list(self)
+
+    def values(self):
+        return list(self.itervalues())
+
+    def items(self):
+        return list(self.iteritems())
+
+    def _eq_data(self, other):
+        if not isinstance(other, Mapping):
+            return NotImplemented
+        return dict(self.iteritems()) == dict(other.iteritems())
+
+    __delitem__ = ConstraintError.block(dict.__delitem__)
+    __setitem__ = ConstraintError.block(dict.__setitem__)
+    clear = ConstraintError.block(dict.clear)
+    pop = ConstraintError.block(dict.pop)
+    popitem = ConstraintError.block(dict.popitem)
+    setdefault = ConstraintError.block(dict.setdefault)
+    update = ConstraintError.block(dict.update)
+
+    def __repr__(self):
+        return "{}({!r})".format(
+            self.__class__.__name__,
+            dict(self.iteritems())
+        )
+
+Mapping.register(MappingEntity)
+
+
+class PersistentEntity(MappingEntity):
+    """An Entity backed by a `PersistentMap` (a hash array mapped trie).
+
+    Copies share all unchanged structure with the original, so `copy` costs
+    O(log n) in time and memory rather than O(n). Prefer this for large
+    entities that go through many versions.
+    """
+    __abstract__ = True
+    __slots__ = ('_data', '_hash', '_computed', '__weakref__')
+
+    def _init_data(self, data):
+        self._data = PersistentMap(data)
+
+    def _evolve(self, changes):
+        entity = self.__class__.__new__(self.__class__)
+        entity._data = self._data.merge(changes)
+        return entity
+
+    def iteritems(self):
+        return self._data.iteritems()
+
+
+class CompactEntity(MappingEntity):
+    """An Entity that stores its values positionally, in field order.
+
+    Instances carry no per-instance dict: just a tuple of values in a single
+    slot, indexed by each class's own field positions. Prefer this when
+    holding very many small entities. Unlike other Entities, members that are
+    not declared as fields are rejected.
+    """
+    __abstract__ = True
+    __slots__ = ('_values', '_hash', '_computed', '__weakref__')
+
+    @classmethod
+    def _prepare_class(cls):
+        cls._field_names = tuple(sorted(cls.fields))
+        cls._field_index = dict(
+            (name, index) for index, name in enumerate(cls._field_names))
+        # Read fields straight from their positions rather than through
+        # `get`; `fields` keeps the Field objects themselves. Accessors
+        # inherited from a parent implementation are bound to its layout, so
+        # those fall back to reading through the parent's Field.
+        inherited = {}
+        for base in reversed(cls.__mro__[1:]):
+            if '_field_index' in vars(base):
+                inherited.update(base.fields)
+        for name, field in inherited.iteritems():
+            if name not in vars(cls):
+                setattr(cls, name, field)
+        for name, index in cls._field_index.iteritems():
+            setattr(cls, name, cls.fields[name].positional(index))
+
+    @classmethod
+    def _additional_properties_error(cls, data):
+        additional = [key for key in data if key not in cls._field_index]
+        return ValidationError("additional properties: %s" % additional, data)
+
+    def _init_data(self, data):
+        if len(data) > len(self._field_names) or not data.viewkeys() <= self._field_index.viewkeys():
+            raise self._additional_properties_error(data)
+        get = data.get
+        NIL = fields.NIL
+        self._values = tuple([get(name, NIL) for name in self._field_names])
+
+    def _evolve(self, changes):
+        values = list(self._values)
+        index = self._field_index
+        try:
+            for key, value in changes.iteritems():
+                values[index[key]] = value
+        except KeyError:
+            raise self._additional_properties_error(changes)
+        entity = self.__class__.__new__(self.__class__)
+        entity._values = tuple(values)
+        return entity
+
+    def __getitem__(self, key):
+        index = self._field_index.get(key)
+        if index is not None:
+            value = self._values[index]
+            if value is not fields.NIL:
+                return value
+        raise KeyError(key)
+
+    def __iter__(self):
+        NIL = fields.NIL
+        for name, value in zip(self._field_names, self._values):
+            if value is not NIL:
+                yield name
+
+    def __len__(self):
+        NIL = fields.NIL
+        return sum(1 for value in self._values if value is not NIL)
+
+    def __contains__(self, key):
+        index = self._field_index.get(key)
+        return index is not None and self._values[index] is not fields.NIL
+
+    def get(self, key, default=None):
+        index = self._field_index.get(key)
+        if index is not None:
+            value = self._values[index]
+            if value is not fields.NIL:
+                return value
+        return default
+
+    def iteritems(self):
+        NIL = fields.NIL
+        for name, value in zip(self._field_names, self._values):
+            if value is not NIL:
+                yield (name, value)
+
+
+class SparseEntity(MappingEntity):
+    """An Entity that only stores members that differ from their defaults.
+
+    Members left at their field's default are not kept in the instance, but
+    read back from the field, so they still appear in `keys`, `items`,
+    `len` and comparisons, just as for other Entities. Prefer this for
+    entities that mostly hold defaults.
+    """
+    __abstract__ = True
+    __slots__ = ('_data', '_hash', '_computed', '__weakref__')
+
+    # Shared by all instances that hold nothing but defaults.
+    _empty = frozendict()
+
+    def _sparsify(self, data, changes):
+        """Store `changes` into `data`, dropping members equal to defaults.
+
+        A defaulted member that is absent is stored as `NIL`.
+        """
+        defaults = self._defaults
+        for key, value in changes.iteritems():
+            if key in defaults:
+                default = defaults[key]
+                if value is default or (type(value) is type(default) and value == default):
+                    data.pop(key, None)
+                    continue
+            data[key] = value
+        return data
+
+    def _init_data(self, data):
+        stored = self._sparsify({}, data)
+        for key in self._defaults:
+            if key not in data:
+                stored[key] = fields.NIL
+        self._data = stored or self._empty
+
+    def _evolve(self, changes):
+        entity = self.__class__.__new__(self.__class__)
+        entity._data = self._sparsify(dict(self._data), changes) or self._empty
+        return entity
+
+    def __getitem__(self, key):
+        value = self._data.get(key, fields.NIL)
+        if value is fields.NIL:
+            if key in self._data or key not in self._defaults:
+                raise KeyError(key)
+            return self._defaults[key]
+        return value
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __contains__(self, key):
+        if key in self._data:
+            return self._data[key] is not fields.NIL
+        return key in self._defaults
+
+    def iteritems(self):
+        NIL = fields.NIL
+        data = self._data
+        for key, value in data.iteritems():
+            if value is not NIL:
+                yield (key, value)
+        for key, value in self._defaults.iteritems():
+            if key not in data:
+                yield (key, value)
+
+    def __iter__(self):
+        for key, value in self.iteritems():
+            yield key
+
+    def __len__(self):
+        NIL = fields.NIL
+        defaults = self._defaults
+        count = len(defaults)
+        for key, value in self._data.iteritems():
+            if key not in defaults:
+                count += 1
+            elif value is NIL:
+                count -= 1
+        return count
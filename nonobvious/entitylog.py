@@ -0,0 +1,390 @@
+# -*- coding: utf-8 -*-
+"""nonobvious.entitylog -- An append-only, on-disk log of entity versions.
+
+An `EntityLog` keeps entities of one class in a directory of segment files.
+Every new version of an entity is appended to the newest segment; nothing is
+ever rewritten in place, except by `compact`. An in-memory index maps each
+entity's key to where its latest version lives, and optionally maps the
+values of chosen fields to the keys that hold them.
+
+Each record in a segment is framed as::
+
+    length (4 bytes) | crc32 (4 bytes) | kind (1 byte) | payload
+
+where the payload is the entity in JSON, as written by its codec, or, for a
+deletion, just the key. When a log is opened, its segments are scanned to
+rebuild the index. A torn or corrupt record at the end of the newest segment
+(as left by a crash mid-write) is cut off; anything else raises
+`LogCorruptedError`.
+"""
+import json
+import mmap
+import os
+import struct
+import zlib
+
+from .primitives import get_codec
+
+__all__ = ['EntityLog', 'LogCorruptedError']
+
+
+HEADER = struct.Struct('<IIB')
+ENTITY = 0
+DELETION = 1
+SEGMENT_PREFIX = 'segment-'
+SEGMENT_SUFFIX = '.log'
+COMPACTING_SUFFIX = '.compacting'
+
+
+class LogCorruptedError(IOError):
+    """A segment holds a record that can't be read back.
+    """
+
+
+def _crc(kind, payload):
+    return zlib.crc32(chr(kind) + payload) & 0xffffffff
+
+
+def _frame(kind, payload):
+    return HEADER.pack(len(payload), _crc(kind, payload), kind) + payload
+
+
+class Segment(object):
+    """One file of the log, read through a memory map.
+    """
+    def __init__(self, path, number):
+        self.path = path
+        self.number = number
+        self._map = None
+        self._file = None
+
+    @property
+    def size(self):
+        return os.path.getsize(self.path)
+
+    def read(self, offset):
+        """Return ``(kind, payload)`` of the record at `offset`.
+        """
+        view = self._get_map(offset + HEADER.size)
+        length, crc, kind = HEADER.unpack_from(view, offset)
+        start = offset + HEADER.size
+        view = self._get_map(start + length)
+        return kind, view[start:start + length]
+
+    def _get_map(self, end):
+        if self._map is None or len(self._map) < end:
+            self.close()
+            self._file = open(self.path, 'rb')
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._map
+
+    def scan(self):
+        """Yield ``(offset, kind, payload)`` for each record, then stop at
+        the end of the segment or at the first record that can't be read.
+
+        Afterwards, `valid_size` holds the size of the readable part.
+        """
+        self.valid_size = 0
+        size = self.size
+        if not size:
+            return
+        view = self._get_map(size)
+        offset = 0
+        while offset + HEADER.size <= size:
+            length, crc, kind = HEADER.unpack_from(view, offset)
+            start = offset + HEADER.size
+            if start + length > size:
+                break
+            payload = view[start:start + length]
+            if kind not in (ENTITY, DELETION) or _crc(kind, payload) != crc:
+                break
+            yield offset, kind, payload
+            offset = self.valid_size = start + length
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._file.close()
+            self._map = self._file = None
+
+
+class EntityLog(object):
+    """An append-only log of versions of entities of one class.
+
+    Entities are identified by the value of their `key` member. The latest
+    version of each can be fetched by key, and, for fields named in
+    `indexes`, looked up by field value with `find`. New segments are started
+    once the current one reaches `segment_size` bytes. If `sync` is true,
+    every write is flushed to disk with ``os.fsync`` before returning.
+    """
+    def __init__(self, path, entity_class, key='id', indexes=(),
+                 segment_size=64 * 1024 * 1024, sync=False):
+        self.path = path
+        self.entity_class = entity_class
+        self.key = key
+        self.indexes = dict((name, {}) for name in indexes)
+        self.segment_size = segment_size
+        self.sync = sync
+        self._codec = get_codec(entity_class)
+        self._offsets = {}
+        self._indexed_values = {}
+        self._segments = []
+        self._segments_by_number = {}
+        self._file = None
+        if not os.path.isdir(path):
+            os.makedirs(path)
+        self._recover()
+
+    def _segment_path(self, number, suffix=SEGMENT_SUFFIX):
+        return os.path.join(self.path, '%s%08d%s' % (SEGMENT_PREFIX, number, suffix))
+
+    def _recover(self):
+        numbers = []
+        for name in os.listdir(self.path):
+            if not name.startswith(SEGMENT_PREFIX):
+                continue
+            if name.endswith(COMPACTING_SUFFIX):
+                # Left over from an interrupted compaction.
+                os.remove(os.path.join(self.path, name))
+            elif name.endswith(SEGMENT_SUFFIX):
+                numbers.append(int(name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)]))
+        numbers.sort()
+
+        for position, number in enumerate(numbers):
+            segment = self._add_segment(number)
+            for offset, kind, payload in segment.scan():
+                self._replay(segment, offset, kind, payload)
+            if segment.valid_size != segment.size:
+                if position != len(numbers) - 1:
+                    raise LogCorruptedError(
+                        "Unreadable record at offset %d of %s" % (segment.valid_size, segment.path))
+                # A torn write at the tail: drop it.
+                segment.close()
+                with open(segment.path, 'r+b') as stream:
+                    stream.truncate(segment.valid_size)
+
+        if not self._segments:
+            self._add_segment(0)
+        self._open_for_append()
+
+    def _add_segment(self, number):
+        segment = Segment(self._segment_path(number), number)
+        self._segments.append(segment)
+        self._segments_by_number[number] = segment
+        return segment
+
+    def _replay(self, segment, offset, kind, payload):
+        if kind == DELETION:
+            self._remove(json.loads(payload))
+        else:
+            entity = self._codec.from_json(payload, trusted=True)
+            self._add(entity, segment.number, offset)
+
+    def _open_for_append(self):
+        if self._file is not None:
+            self._file.close()
+        self._file = open(self._segments[-1].path, 'ab')
+        self._file.seek(0, os.SEEK_END)
+
+    # Index maintenance
+
+    def _add(self, entity, number, offset):
+        key = entity[self.key]
+        self._remove(key)
+        self._offsets[key] = (number, offset)
+        if self.indexes:
+            values = {}
+            for name, index in self.indexes.iteritems():
+                if name in entity:
+                    value = values[name] = entity[name]
+                    index.setdefault(value, set()).add(key)
+            self._indexed_values[key] = values
+
+    def _remove(self, key):
+        if self._offsets.pop(key, None) is None:
+            return
+        for name, value in self._indexed_values.pop(key, {}).iteritems():
+            keys = self.indexes[name][value]
+            keys.discard(key)
+            if not keys:
+                del self.indexes[name][value]
+
+    # Writing
+
+    def _write(self, records):
+        """Append framed records, given as ``(kind, payload, subject)``,
+        where the subject is the entity, or the key of a deletion.
+        """
+        stream = self._file
+        segment = self._segments[-1]
+        offset = stream.tell()
+        chunks = []
+        for kind, payload, subject in records:
+            if offset >= self.segment_size:
+                stream.write(b''.join(chunks))
+                chunks = []
+                self._flush()
+                segment = self._start_segment()
+                stream = self._file
+                offset = 0
+            record = _frame(kind, payload)
+            chunks.append(record)
+            if kind == DELETION:
+                self._remove(subject)
+            else:
+                self._add(subject, segment.number, offset)
+            offset += len(record)
+        stream.write(b''.join(chunks))
+        self._flush()
+
+    def _flush(self):
+        self._file.flush()
+        if self.sync:
+            os.fsync(self._file.fileno())
+
+    def _start_segment(self):
+        segment = self._add_segment(self._segments[-1].number + 1)
+        self._open_for_append()
+        return segment
+
+    def append(self, entity):
+        """Append a new version of an entity.
+        """
+        self.extend((entity,))
+
+    def extend(self, entities):
+        """Append many entities in one write; return how many were written.
+        """
+        to_json = self._codec.to_json
+        records = [(ENTITY, to_json(entity), entity) for entity in entities]
+        self._write(records)
+        return len(records)
+
+    def load(self, rows, collect_errors=False, trusted=False):
+        """Build entities from rows in bulk and append them.
+
+        Returns the `BulkLoader` used, for its counters and errors.
+        """
+        loader = self.entity_class.bulk(rows, collect_errors=collect_errors, trusted=trusted)
+        self.extend(loader)
+        return loader
+
+    def delete(self, key):
+        """Record that the entity with `key` is gone.
+        """
+        if key not in self._offsets:
+            raise KeyError(key)
+        self._write([(DELETION, json.dumps(key), key)])
+
+    # Reading
+
+    def _read(self, number, offset):
+        kind, payload = self._segments_by_number[number].read(offset)
+        return self._codec.from_json(payload, trusted=True)
+
+    def get(self, key, default=None):
+        """Return the latest version of the entity with `key`.
+        """
+        location = self._offsets.get(key)
+        if location is None:
+            return default
+        return self._read(*location)
+
+    def __getitem__(self, key):
+        location = self._offsets.get(key)
+        if location is None:
+            raise KeyError(key)
+        return self._read(*location)
+
+    def __contains__(self, key):
+        return key in self._offsets
+
+    def __len__(self):
+        return len(self._offsets)
+
+    def __iter__(self):
+        """Iterate over the keys of the entities in the log.
+        """
+        return iter(self._offsets)
+
+    def iteritems(self):
+        for key, location in self._offsets.iteritems():
+            yield key, self._read(*location)
+
+    def find(self, name, value):
+        """Return the latest versions of entities whose `name` field equals
+        `value`. The field must be one of the log's `indexes`.
+        """
+        keys = self.indexes[name].get(value, ())
+        return [self[key] for key in keys]
+
+    # Maintenance
+
+    def compact(self):
+        """Rewrite the log keeping only the latest version of each entity.
+
+        The live records are copied to new segments, which replace the old
+        ones only once they are completely written.
+        """
+        self._flush()
+        number = self._segments[-1].number + 1
+        live = sorted(self._offsets.iteritems(), key=lambda item: item[1])
+        written = []
+        stream = None
+        offsets = {}
+        for key, (old_number, old_offset) in live:
+            if stream is None or stream.tell() >= self.segment_size:
+                if stream is not None:
+                    stream.close()
+                    number += 1
+                written.append(number)
+                stream = open(self._segment_path(number, COMPACTING_SUFFIX), 'wb')
+            kind, payload = self._segments_by_number[old_number].read(old_offset)
+            offsets[key] = (number, stream.tell())
+            stream.write(_frame(kind, payload))
+        if stream is not None:
+            stream.flush()
+            os.fsync(stream.fileno())
+            stream.close()
+        else:
+            written.append(number)
+            open(self._segment_path(number, COMPACTING_SUFFIX), 'wb').close()
+
+        for new_number in written:
+            os.rename(
+                self._segment_path(new_number, COMPACTING_SUFFIX),
+                self._segment_path(new_number)
+            )
+        self._file.close()
+        self._file = None
+        for segment in self._segments:
+            segment.close()
+            os.remove(segment.path)
+
+        self._segments = []
+        self._segments_by_number = {}
+        for new_number in written:
+            self._add_segment(new_number)
+        self._offsets = offsets
+        self._open_for_append()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        for segment in self._segments:
+            segment.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __repr__(self):
+        return "{}({!r}, {}, {} entities)".format(
+            self.__class__.__name__,
+            self.path,
+            self.entity_class.__name__,
+            len(self)
+        )
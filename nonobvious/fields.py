@@ -1,13 +1,17 @@
 # -*- coding: utf-8 -*-
 """entities.fields
 """
+from collections import Mapping
+
 from concon import frozenlist
 from concon import ConstraintError
 import valideer as V
 
-__all__ = ['Boolean', 'Embedded', 'Date', 'DateTime', 'Field', 'Integer',
-           'IntegerList', 'NIL', 'String', 'StringList', 'TimeZoneAwareField',
-           'Time']
+from .sequences import frozenarray, internedtuple
+
+__all__ = ['Boolean', 'Computed', 'Embedded', 'Date', 'DateTime', 'Field',
+           'Integer', 'IntegerList', 'LazyEntity', 'ListField', 'NIL', 'String',
+           'StringList', 'TimeZoneAwareField', 'Time', 'computed']
 
 
 class NIL: pass
@@ -24,12 +28,15 @@ class Field(object):
 
     choices = None
 
+    #: False while the field's validator cannot be built yet.
+    resolved = True
+
     def add_validator(self, validator):
         if validator is not None:
             if self.validator is Field.validator:
                 self.validator = validator
             else:
-                self.validator = V.AllOf(self.validator, validator)
+                self.validator = V.ChainOf(self.validator, validator)
 
     def __init__(
             self,
@@ -40,11 +47,34 @@ class Field(object):
         self.key = key
         self.required = required
         self.default = default
+        self.custom_validator = validator
         self.add_validator(validator)
         if choices is not None:
             self.choices = tuple(choices)
             self.add_validator(V.Enum(self.choices))
 
+    def get_default(self):
+        """Return the default value as validation would adapt it.
+
+        Must only be called once the field's validator can be built. A default
+        that doesn't validate is returned as is, to be reported when used.
+        """
+        default = self.default
+        if default is NIL:
+            return default
+        try:
+            return self.get_validator().validate(default)
+        except V.ValidationError:
+            return default
+
+    def get_validator(self):
+        """Return the compiled validator for this field's values.
+        """
+        validator = self.__dict__.get('_compiled_validator')
+        if validator is None:
+            validator = self._compiled_validator = V.parse(self.validator)
+        return validator
+
     def __get__(self, obj, type=None):
         if obj is None:
             return self
@@ -53,6 +83,19 @@ class Field(object):
     def __set__(self, obj, value):
         raise ConstraintError("Entity fields are read-only.")
 
+    def positional(self, index):
+        """Return an accessor reading this field from position `index` of a
+        `CompactEntity`'s values, which reads like `__get__` but faster.
+        """
+        default = self.default
+
+        def get(obj):
+            value = obj._values[index]
+            if value is NIL:
+                return default
+            return value
+        return property(get, self.__set__, doc=self.__doc__)
+
     @property
     def validation_spec(self):
         key = self.key
@@ -65,10 +108,141 @@ class Boolean(Field):
     validator = 'boolean'
 
 
+class LazyEntity(Mapping):
+    """Stands in for an embedded entity that hasn't been built yet.
+
+    Holds the raw mapping it was given; the entity is built (and validated)
+    by `materialize` the first time it is needed, then kept. The stand-in is
+    itself a read-only mapping of the entity's members.
+    """
+    __slots__ = ('entity_class', 'data', 'build', '_entity')
+
+    def __init__(self, entity_class, data, build=None):
+        self.entity_class = entity_class
+        self.data = data
+        self.build = entity_class if build is None else build
+
+    def materialize(self):
+        """Return the embedded entity, building it on first use.
+        """
+        try:
+            return self._entity
+        except AttributeError:
+            pass
+        entity = self._entity = self.build(self.data)
+        self.data = self.build = None
+        return entity
+
+    @property
+    def materialized(self):
+        return hasattr(self, '_entity')
+
+    def __getitem__(self, key):
+        return self.materialize()[key]
+
+    def __iter__(self):
+        return iter(self.materialize())
+
+    def __len__(self):
+        return len(self.materialize())
+
+    def __hash__(self):
+        # Agree with equality to the built entity when there is one; invalid
+        # data only equals the same raw data (see `__eq__`).
+        try:
+            return hash(self.materialize())
+        except V.ValidationError:
+            from .entities import hash_value
+            return hash_value(self.data)
+
+    def __eq__(self, other):
+        if isinstance(other, LazyEntity):
+            if (not self.materialized and not other.materialized
+                    and self.entity_class is other.entity_class
+                    and self.build is other.build
+                    and self.data == other.data):
+                return True
+            try:
+                other = other.materialize()
+            except V.ValidationError:
+                return False
+        try:
+            return self.materialize() == other
+        except V.ValidationError:
+            return False
+
+    def __ne__(self, other):
+        return not self == other
+
+    def to_primitive(self):
+        return self.materialize().to_primitive()
+
+    def __reduce__(self):
+        # Pickle the entity class by name, as entities do. A custom `build`
+        # can't be pickled, so the entity is built first in that case.
+        if not self.materialized and self.build is not self.entity_class:
+            self.materialize()
+        entity = getattr(self, '_entity', None)
+        return (_unpickle_lazy, (self.entity_class.__name__, self.data, entity))
+
+    def __repr__(self):
+        if self.materialized:
+            return "Lazy({!r})".format(self._entity)
+        return "Lazy({}({!r}))".format(self.entity_class.__name__, self.data)
+
+
+def _unpickle_lazy(class_name, data, entity):
+    from . import entities
+    lazy = LazyEntity(entities.BaseEntity.entities[class_name], data)
+    if entity is not None:
+        lazy._entity = entity
+        lazy.data = lazy.build = None
+    return lazy
+
+
 class Embedded(Field):
+    """A field holding another Entity.
+
+    Mappings are adapted to the embedded Entity class when the parent is
+    built. If `lazy` is true, they are kept as given in a `LazyEntity`
+    instead, and only built and validated when the field is first read.
+    Call `validate` on the parent to check everything up front.
+    """
     @property
     def validator(self):
-        return V.AdaptTo(self.entity)
+        if self.lazy:
+            return V.AdaptBy(self._make_lazy)
+        return V.AdaptBy(self._adapt)
+
+    def _adapt(self, value):
+        """Return `value` as an instance of the embedded Entity class.
+
+        Instances, and lazy stand-ins for them, are reused rather than rebuilt.
+        """
+        entity_class = self.entity
+        if isinstance(value, entity_class):
+            return value
+        if isinstance(value, LazyEntity) and issubclass(value.entity_class, entity_class):
+            return value.materialize()
+        return entity_class(value)
+
+    def _make_lazy(self, value):
+        entity_class = self.entity
+        if isinstance(value, (entity_class, LazyEntity)):
+            return value
+        if not isinstance(value, Mapping):
+            raise TypeError("Expected a mapping, got %r" % (value,))
+        return LazyEntity(entity_class, dict(value))
+
+    @property
+    def resolved(self):
+        if hasattr(self, '_entity'):
+            return True
+        entity_spec = self.entity_spec
+        if isinstance(entity_spec, basestring):
+            from . import entities
+            return entity_spec in entities.Entity.entities
+        return True
 
     @property
     def entity(self):
@@ -86,30 +260,88 @@ class Embedded(Field):
             entity_spec = kwargs.pop('entity')
         except KeyError:
             raise TypeError('Embedded field requires an `entity` argument.')
+        self.lazy = kwargs.pop('lazy', False)
         super(Embedded, self).__init__(**kwargs)
         self.entity_spec = entity_spec
 
+    def __get__(self, obj, type=None):
+        value = super(Embedded, self).__get__(obj, type)
+        if isinstance(value, LazyEntity):
+            return value.materialize()
+        return value
+
+    def positional(self, index):
+        get = super(Embedded, self).positional(index).fget
+
+        def get_embedded(obj):
+            value = get(obj)
+            if isinstance(value, LazyEntity):
+                return value.materialize()
+            return value
+        return property(get_embedded, self.__set__, doc=self.__doc__)
+
 
 class String(Field):
     validator = 'string'
 
 
-class StringList(Field):
-    validator = V.AllOf(
-        V.HomogeneousSequence(item_schema = 'string'),
-        V.AdaptTo(frozenlist)
-    )
+class SequenceOf(V.Validator):
+    """Accepts a sequence (but not a string) of items matching `item_schema`,
+    adapted to the immutable `container` type.
+
+    Values that already are `container`s are returned as they are, once
+    their items are checked, so validated sequences are shared by reference
+    rather than copied.
+    """
+    def __init__(self, item_schema, container):
+        self._sequence = V.HomogeneousSequence(item_schema=item_schema)
+        self.container = container
+
+    def validate(self, value, adapt=True):
+        self._sequence.validate(value, adapt=False)
+        if not adapt or isinstance(value, self.container):
+            return value
+        try:
+            return self.container(value)
+        except Exception as ex:
+            raise V.ValidationError(str(ex), value)
+
+    @property
+    def humanized_name(self):
+        return self._sequence.humanized_name
+
+
+class ListField(Field):
+    """A field holding an immutable sequence of items of one type.
+
+    Values are stored as `frozenlist`s, or, if `compact` is true, in the
+    more compact `compact_container` (see `nonobvious.sequences`).
+    """
+    item_schema = None
+    container = frozenlist
+    compact_container = None
+
+    def __init__(self, **kwargs):
+        if kwargs.pop('compact', False):
+            self.container = self.compact_container
+            self.validator = SequenceOf(self.item_schema, self.container)
+        super(ListField, self).__init__(**kwargs)
+
+
+class StringList(ListField):
+    item_schema = 'string'
+    compact_container = internedtuple
+    validator = SequenceOf('string', frozenlist)
 
 
 class Integer(Field):
     validator = 'integer'
 
 
-class IntegerList(Field):
-    validator = V.AllOf(
-        V.HomogeneousSequence(item_schema = 'integer'),
-        V.AdaptTo(frozenlist)
-    )
+class IntegerList(ListField):
+    item_schema = 'integer'
+    compact_container = frozenarray
+    validator = SequenceOf('integer', frozenlist)
 
 
 class Date(Field):
@@ -122,7 +354,7 @@ class TimeZoneAwareField(Field):
         return d.tzinfo is not None and d.tzinfo.utcoffset(d) is not None
 
     def __init__(self, **kwargs):
-        naive_ok = kwargs.pop('naive_ok', False)
+        naive_ok = self.naive_ok = kwargs.pop('naive_ok', False)
         super(TimeZoneAwareField, self).__init__(**kwargs)
         if not naive_ok:
             self.add_validator(self.has_tzinfo)
@@ -134,3 +366,53 @@ class Time(TimeZoneAwareField):
 
 class DateTime(TimeZoneAwareField):
     validator = 'datetime'
+
+
+class Computed(object):
+    """A value derived from an entity's members, computed on first access.
+
+    `function` is called with the entity, and its result is kept with that
+    instance. Computed values are not members: they are not validated, and
+    don't appear in the entity's keys, items or comparisons.
+
+    `depends` names the members the value is derived from. A copy that
+    leaves all of them unchanged takes the computed value with it; if
+    `depends` is None, copies always compute it again.
+    """
+    key = None
+
+    def __init__(self, function, depends=None):
+        self.function = function
+        self.depends = None if depends is None else frozenset(depends)
+        self.__doc__ = function.__doc__
+
+    def __get__(self, obj, type=None):
+        if obj is None:
+            return self
+        try:
+            cache = obj._computed
+        except AttributeError:
+            cache = obj._computed = {}
+        try:
+            return cache[self.key]
+        except KeyError:
+            value = cache[self.key] = self.function(obj)
+            return value
+
+    def __set__(self, obj, value):
+        raise ConstraintError("Entity fields are read-only.")
+
+
+def computed(depends=None):
+    """Declare a `Computed` field by decorating the function deriving it::
+
+        class Order(Entity):
+            quantities = IntegerList(default=())
+
+            @computed(depends=['quantities'])
+            def total(self):
+                return sum(self.quantities)
+    """
+    def decorator(function):
+        return Computed(function, depends)
+    return decorator
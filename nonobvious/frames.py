@@ -0,0 +1,297 @@
+# -*- coding: utf-8 -*-
+"""nonobvious.frames -- Column-oriented collections of entities.
+
+Requires the `numpy` package.
+"""
+import datetime as dt
+from itertools import izip
+
+from valideer import ValidationError
+
+from . import fields
+
+__all__ = ['EntityFrame']
+
+
+class UTCTimeZone(dt.tzinfo):
+    """The UTC timezone, for datetimes restored from a column.
+    """
+    def utcoffset(self, d):
+        return dt.timedelta(0)
+
+    def dst(self, d):
+        return dt.timedelta(0)
+
+    def tzname(self, d):
+        return 'UTC'
+
+    def __repr__(self):
+        return '<UTC>'
+
+UTC = UTCTimeZone()
+
+
+# Field type -> (column kind, value types stored in typed arrays)
+COLUMN_KINDS = (
+    (fields.Boolean, 'boolean', (bool,)),
+    (fields.Integer, 'integer', (int, long)),
+    (fields.DateTime, 'datetime', (dt.datetime,)),
+    (fields.Date, 'date', (dt.date,)),
+    (fields.String, 'string', (str, unicode)),
+)
+
+DTYPES = {
+    'boolean': 'bool',
+    'integer': 'int64',
+    'date': 'datetime64[D]',
+    'datetime': 'datetime64[us]',
+}
+
+
+def get_column_kind(field):
+    """Return ``(kind, fast_types)`` for the column holding `field`'s values.
+
+    Fields with custom validators always get plain object columns.
+    """
+    if field.custom_validator is None:
+        for field_type, kind, fast_types in COLUMN_KINDS:
+            if isinstance(field, field_type):
+                return kind, frozenset(fast_types)
+    return 'object', frozenset()
+
+
+class Column(object):
+    """A single field's values, stored as a numpy array.
+
+    String columns may be categorical, in which case `data` holds integer
+    codes into `categories`.
+    """
+    def __init__(self, kind, data, aware=False, categories=None):
+        self.kind = kind
+        self.data = data
+        self.aware = aware
+        self.categories = categories
+
+    def take(self, selector):
+        return Column(self.kind, self.data[selector], self.aware, self.categories)
+
+    def values(self):
+        """Return the column decoded into a numpy array.
+        """
+        if self.categories is not None:
+            return self.categories[self.data]
+        return self.data
+
+    def tolist(self):
+        """Return the column's values as plain python objects.
+        """
+        if self.categories is not None:
+            return self.categories[self.data].tolist()
+        values = self.data.tolist()
+        if self.aware:
+            values = [value.replace(tzinfo=UTC) for value in values]
+        return values
+
+
+class EntityFrame(object):
+    """A column-oriented collection of entities of a single class.
+
+    Each field is stored as a numpy array: typed arrays for Integer, Boolean,
+    Date and DateTime fields, object arrays for everything else. String fields
+    named in `categorical` are stored as integer codes into their categories.
+    Columns are validated as a whole wherever the field types allow; other
+    fields fall back to their validators, value by value.
+
+    Indexing with an integer materializes that row as an entity. Indexing with
+    a field name returns its column. Indexing with a slice, an index array or
+    a boolean mask returns a new frame, without materializing any entities.
+
+    Requires the `numpy` package.
+    """
+    def __init__(self, entity_class, rows=(), categorical=(), validate=True):
+        import numpy
+        self._np = numpy
+        self.entity_class = entity_class
+        self.categorical = frozenset(categorical)
+
+        names = set(entity_class.fields)
+        entity_class.get_validator()  # Adapts the defaults, if not done yet.
+        defaults = entity_class._defaults
+        merged = []
+        for index, row in enumerate(rows):
+            data = dict(defaults)
+            data.update(row)
+            if not names.issuperset(data):
+                additional = [key for key in data if key not in names]
+                raise ValidationError(
+                    "additional properties: %s" % additional, row
+                ).add_context(index)
+            merged.append(data)
+
+        self._length = len(merged)
+        self.columns = dict(
+            (name, self._build_column(field, [row.get(name, fields.NIL) for row in merged], validate))
+            for name, field in entity_class.fields.iteritems()
+        )
+
+    @classmethod
+    def _from_columns(cls, other, columns, length):
+        frame = cls.__new__(cls)
+        frame._np = other._np
+        frame.entity_class = other.entity_class
+        frame.categorical = other.categorical
+        frame.columns = columns
+        frame._length = length
+        return frame
+
+    def _build_column(self, field, values, validate):
+        np = self._np
+        name = field.key
+        kind, fast_types = get_column_kind(field)
+        types = set(map(type, values))
+
+        if fields.NIL in values:
+            if field.required and validate:
+                index = values.index(fields.NIL)
+                raise ValidationError(
+                    "missing required properties: %s" % [name], None
+                ).add_context(index)
+            # Columns with missing values can't be typed.
+            kind = 'object'
+
+        if kind != 'object' and not types <= fast_types:
+            kind = 'object'
+
+        if kind == 'object':
+            if validate:
+                values = self._validate_values(field, values)
+            return Column('object', self._object_array(values))
+
+        column = self._build_typed_column(field, kind, values, validate)
+        if column is None:
+            if validate:
+                values = self._validate_values(field, values)
+            return Column('object', self._object_array(values))
+
+        if validate and field.choices is not None:
+            if kind in ('date', 'datetime'):
+                self._validate_values(field, values)
+            else:
+                valid = np.in1d(column.values(), np.array(field.choices))
+                if not valid.all():
+                    index = int(np.flatnonzero(~valid)[0])
+                    self._validate_values(field, values[index:index + 1], index)
+        return column
+
+    def _build_typed_column(self, field, kind, values, validate):
+        """Return a typed column for `values`, or None if they won't fit one.
+        """
+        np = self._np
+        if kind == 'string':
+            if field.key in self.categorical:
+                categories, codes = np.unique(self._object_array(values), return_inverse=True)
+                return Column(kind, codes.astype('int32'), categories=categories)
+            return Column(kind, self._object_array(values))
+
+        aware = False
+        if kind == 'datetime':
+            offsets = set(value.utcoffset() is not None for value in values)
+            if validate and not field.naive_ok and False in offsets:
+                return None
+            if len(offsets) > 1:
+                return None
+            aware = True in offsets
+            if aware:
+                values = [value.astimezone(UTC).replace(tzinfo=None) for value in values]
+
+        try:
+            data = np.array(values, dtype=DTYPES[kind])
+        except (OverflowError, ValueError, TypeError):
+            return None
+        return Column(kind, data, aware=aware)
+
+    def _validate_values(self, field, values, offset=0):
+        validate = field.get_validator().validate
+        validated = []
+        for index, value in enumerate(values, offset):
+            if value is fields.NIL:
+                validated.append(value)
+                continue
+            try:
+                validated.append(validate(value))
+            except ValidationError as ex:
+                raise ex.add_context(field.key).add_context(index)
+        return validated
+
+    def _object_array(self, values):
+        array = self._np.empty(len(values), dtype=object)
+        array[:] = values
+        return array
+
+    def __len__(self):
+        return self._length
+
+    def column(self, name):
+        """Return the named field's values as a numpy array.
+        """
+        return self.columns[name].values()
+
+    def row(self, index):
+        """Materialize the row at `index` as an entity.
+        """
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError(index)
+        data = {}
+        for name, column in self.columns.iteritems():
+            value = column.data[index]
+            if column.categories is not None:
+                value = column.categories[value]
+            elif column.kind in ('object', 'string'):
+                if value is fields.NIL:
+                    continue
+            else:
+                value = value.item()
+                if column.aware:
+                    value = value.replace(tzinfo=UTC)
+            data[name] = value
+        return self.entity_class.trusted(data)
+
+    def take(self, selector):
+        """Return a new frame of the rows chosen by a slice, index array or mask.
+        """
+        columns = dict(
+            (name, column.take(selector))
+            for name, column in self.columns.iteritems()
+        )
+        length = len(self._np.arange(self._length)[selector])
+        return self._from_columns(self, columns, length)
+
+    def __getitem__(self, key):
+        if isinstance(key, basestring):
+            return self.column(key)
+        elif isinstance(key, (int, long, self._np.integer)):
+            return self.row(int(key))
+        return self.take(key)
+
+    def __iter__(self):
+        """Lazily materialize each row as an entity.
+        """
+        NIL = fields.NIL
+        trusted = self.entity_class.trusted
+        names = list(self.columns)
+        columns = [self.columns[name].tolist() for name in names]
+        for values in izip(*columns):
+            yield trusted(dict(
+                (name, value)
+                for name, value in izip(names, values)
+                if value is not NIL
+            ))
+
+    def __repr__(self):
+        return "{}({}, {} rows)".format(
+            self.__class__.__name__,
+            self.entity_class.__name__,
+            self._length
+        )
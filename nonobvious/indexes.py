@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+"""nonobvious.indexes -- Entity collections with secondary indexes.
+"""
+from bisect import bisect_left, bisect_right
+
+from . import fields
+
+__all__ = ['HashIndex', 'IndexedCollection', 'SortedIndex']
+
+
+#: Field types whose values can be kept in a `SortedIndex`.
+ORDERED_FIELDS = (fields.Integer, fields.Date, fields.DateTime)
+
+
+class HashIndex(object):
+    """Maps each value of a field to the keys of the entities holding it.
+    """
+    def __init__(self, name):
+        self.name = name
+        self._keys = {}
+
+    def add(self, key, value):
+        self._keys.setdefault(value, set()).add(key)
+
+    def remove(self, key, value):
+        keys = self._keys[value]
+        keys.discard(key)
+        if not keys:
+            del self._keys[value]
+
+    def lookup(self, value):
+        """Return the keys of entities whose field equals `value`.
+        """
+        return self._keys.get(value, ())
+
+    def __len__(self):
+        return len(self._keys)
+
+
+class SortedIndex(object):
+    """Keeps a field's values in order, for range lookups.
+
+    Entities whose field is missing or None are left out.
+    """
+    def __init__(self, name):
+        self.name = name
+        self._values = []
+        self._keys = []
+
+    def add(self, key, value):
+        if value is not None:
+            position = bisect_right(self._values, value)
+            self._values.insert(position, value)
+            self._keys.insert(position, key)
+
+    def remove(self, key, value):
+        if value is not None:
+            values = self._values
+            position = self._keys.index(
+                key, bisect_left(values, value), bisect_right(values, value))
+            del values[position]
+            del self._keys[position]
+
+    def lookup(self, value):
+        return self.range(value, value)
+
+    def range(self, low=None, high=None):
+        """Return the keys of entities whose field lies between `low` and
+        `high`, inclusive, in field order. Either bound may be None.
+        """
+        values = self._values
+        start = 0 if low is None else bisect_left(values, low)
+        stop = len(values) if high is None else bisect_right(values, high)
+        return self._keys[start:stop]
+
+    def __len__(self):
+        return len(self._values)
+
+
+class IndexedCollection(object):
+    """A collection of entities of one class, kept indexed by field value.
+
+    Entities are identified by the value of their `key` member; adding an
+    entity whose key is already present replaces the old version (e.g. with
+    its `copy`), updating the indexes for just that entity. Fields named in
+    `hashed` get a `HashIndex`, for `find`; Integer, Date and DateTime fields
+    named in `ordered` get a `SortedIndex`, for `find` and `range`.
+    """
+    def __init__(self, entity_class, entities=(), key='id', hashed=(), ordered=()):
+        self.entity_class = entity_class
+        self.key = key
+        self.indexes = {}
+        for name in hashed:
+            self.indexes[name] = HashIndex(name)
+        for name in ordered:
+            field = entity_class.fields.get(name)
+            if not isinstance(field, ORDERED_FIELDS):
+                raise TypeError("Can't keep a sorted index of %s field %r." % (
+                    field.__class__.__name__, name))
+            self.indexes[name] = SortedIndex(name)
+        self._entities = {}
+        self.extend(entities)
+
+    def add(self, entity):
+        """Add an entity, replacing any with the same key.
+        """
+        key = entity[self.key]
+        old = self._entities.get(key)
+        if old is entity:
+            return
+        for name, index in self.indexes.iteritems():
+            if old is not None and name in old:
+                value = old[name]
+                if name in entity and entity[name] == value:
+                    continue
+                index.remove(key, value)
+            if name in entity:
+                index.add(key, entity[name])
+        self._entities[key] = entity
+
+    def extend(self, entities):
+        for entity in entities:
+            self.add(entity)
+
+    def remove(self, key):
+        """Remove the entity with the given key.
+        """
+        entity = self._entities.pop(key)
+        for name, index in self.indexes.iteritems():
+            if name in entity:
+                index.remove(key, entity[name])
+
+    def get(self, key, default=None):
+        return self._entities.get(key, default)
+
+    def __getitem__(self, key):
+        return self._entities[key]
+
+    def __contains__(self, key):
+        return key in self._entities
+
+    def __len__(self):
+        return len(self._entities)
+
+    def __iter__(self):
+        """Iterate over the entities, in no particular order.
+        """
+        return self._entities.itervalues()
+
+    def find(self, name, value):
+        """Return the entities whose field `name` equals `value`.
+        """
+        entities = self._entities
+        return [entities[key] for key in self.indexes[name].lookup(value)]
+
+    def find_one(self, name, value, default=None):
+        """Return an entity whose field `name` equals `value`, or `default`.
+        """
+        for key in self.indexes[name].lookup(value):
+            return self._entities[key]
+        return default
+
+    def range(self, name, low=None, high=None):
+        """Return the entities whose field `name` lies between `low` and
+        `high`, inclusive, ordered by that field. The field must have a sorted
+        index. Either bound may be None to leave that end open.
+        """
+        entities = self._entities
+        return [entities[key] for key in self.indexes[name].range(low, high)]
+
+    def __repr__(self):
+        return "{}({}, {} entities)".format(
+            self.__class__.__name__,
+            self.entity_class.__name__,
+            len(self)
+        )
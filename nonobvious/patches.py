@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+"""nonobvious.patches -- Compact deltas between versions of an entity.
+
+A patch is a primitive dict mapping each changed member to an operation:
+
+``['=', value]``
+    The member was added or replaced. The value is in primitive form, as
+    written by the entity's codec.
+
+``['-']``
+    The member was removed.
+
+``['~', patch]``
+    The embedded entity changed; `patch` applies to it in turn.
+
+``['*', start, stop, items]``
+    Items ``start:stop`` of a StringList or IntegerList were replaced with
+    `items`.
+
+Patches only use dicts, lists, strings, numbers, booleans and None, so they
+can be sent with `json` or `msgpack` like any primitive entity.
+"""
+from valideer import ValidationError
+
+from . import fields
+from .primitives import get_codec
+
+__all__ = ['diff', 'patch']
+
+
+SET = '='
+UNSET = '-'
+EMBEDDED = '~'
+SPLICE = '*'
+
+
+def _unwrap(value):
+    if isinstance(value, fields.LazyEntity):
+        return value.materialize()
+    return value
+
+
+def _diff_lists(old, new):
+    """Return ``[start, stop, items]``: the smallest single splice of `old`
+    that gives `new`.
+    """
+    limit = min(len(old), len(new))
+    start = 0
+    while start < limit and old[start] == new[start]:
+        start += 1
+    end = 0
+    while end < limit - start and old[-end - 1] == new[-end - 1]:
+        end += 1
+    return [start, len(old) - end, list(new[start:len(new) - end])]
+
+
+def diff(old, new):
+    """Return the patch that turns entity `old` into entity `new`.
+
+    Both must be instances of the same Entity class.
+    """
+    if old.__class__ is not new.__class__:
+        raise TypeError("Can't diff a %s against a %s." % (
+            old.__class__.__name__, new.__class__.__name__))
+    codec = get_codec(old.__class__)
+    field_map = old.fields
+    changes = {}
+    for key in set(old) | set(new):
+        if key not in new:
+            changes[key] = [UNSET]
+            continue
+        value = _unwrap(new[key])
+        if key not in old:
+            changes[key] = [SET, codec.encode_value(key, value)]
+            continue
+        previous = _unwrap(old[key])
+        if previous is value or previous == value:
+            continue
+        field = field_map.get(key)
+        if (isinstance(field, fields.Embedded)
+                and previous is not None and value is not None
+                and previous.__class__ is value.__class__):
+            changes[key] = [EMBEDDED, diff(previous, value)]
+        elif (isinstance(field, (fields.StringList, fields.IntegerList))
+                and previous is not None and value is not None):
+            changes[key] = [SPLICE] + _diff_lists(previous, value)
+        else:
+            changes[key] = [SET, codec.encode_value(key, value)]
+    return changes
+
+
+def _splice(value, start, stop, items):
+    value = list(value)
+    if not 0 <= start <= stop <= len(value):
+        raise ValueError("Splice %d:%d is out of range." % (start, stop))
+    value[start:stop] = items
+    return value
+
+
+def patch(entity, changes):
+    """Return a new version of `entity` with the patch applied.
+
+    Only the members the patch touches are validated. Raises ValidationError
+    if the result would be invalid, or if the patch doesn't fit the entity.
+    """
+    cls = entity.__class__
+    codec = get_codec(cls)
+    field_map = cls.fields
+    updates = {}
+    removed = []
+    for key, operation in changes.iteritems():
+        try:
+            op = operation[0]
+            if op == SET:
+                updates[key] = codec.decode_value(key, operation[1])
+            elif op == UNSET:
+                field = field_map.get(key)
+                if field is not None and field.required:
+                    raise ValidationError("missing required properties: %s" % [key], None)
+                removed.append(key)
+            elif op == EMBEDDED:
+                updates[key] = patch(_unwrap(entity[key]), operation[1])
+            elif op == SPLICE:
+                updates[key] = _splice(entity[key], *operation[1:])
+            else:
+                raise ValueError("Unknown patch operation: %r" % (op,))
+        except ValidationError as ex:
+            raise ex.add_context(key)
+        except (LookupError, ValueError, TypeError) as ex:
+            raise ValidationError(str(ex), operation).add_context(key)
+
+    embedded = dict(
+        (key, updates.pop(key)) for key, operation in changes.iteritems()
+        if operation[0] == EMBEDDED
+    )
+    updates = cls._validate_changes(updates)
+    updates.update(embedded)
+    if removed:
+        data = dict(entity.iteritems())
+        for key in removed:
+            data.pop(key, None)
+        data.update(updates)
+        result = cls._from_validated(data)
+    else:
+        result = entity._evolve(updates)
+    if cls.interned:
+        result = cls.intern(result)
+    return result
@@ -0,0 +1,270 @@
+# -*- coding: utf-8 -*-
+"""nonobvious.persistent -- Persistent (structure-sharing) data structures.
+
+`PersistentMap` is an immutable mapping implemented as a hash array mapped
+trie (HAMT). Every "modification" returns a new map that shares all of its
+untouched structure with the original, so an update costs O(log n) time and
+memory rather than the O(n) of copying a whole dict.
+
+Based on Phil Bagwell's paper, [Ideal Hash
+Trees](http://lampwww.epfl.ch/papers/idealhashtrees.pdf), as popularized by
+Clojure's persistent hash maps.
+"""
+from collections import Mapping
+
+__all__ = ['PersistentMap']
+
+BITS = 5
+MASK = (1 << BITS) - 1
+HASH_MASK = 0xFFFFFFFF
+
+
+class _MISSING: pass
+
+
+def _hash(key):
+    return hash(key) & HASH_MASK
+
+
+def _bit(h, shift):
+    return 1 << ((h >> shift) & MASK)
+
+
+def _index(bitmap, bit):
+    return bin(bitmap & (bit - 1)).count('1')
+
+
+def _merge_leaves(shift, leaf1, leaf2):
+    """Return a node holding two leaves whose keys differ.
+    """
+    h1 = leaf1[0]
+    h2 = leaf2[0]
+    if h1 == h2:
+        return _CollisionNode(h1, (leaf1, leaf2))
+    bit1 = _bit(h1, shift)
+    bit2 = _bit(h2, shift)
+    if bit1 == bit2:
+        return _BitmapNode(bit1, (_merge_leaves(shift + BITS, leaf1, leaf2),))
+    elif bit1 < bit2:
+        return _BitmapNode(bit1 | bit2, (leaf1, leaf2))
+    else:
+        return _BitmapNode(bit1 | bit2, (leaf2, leaf1))
+
+
+class _BitmapNode(object):
+    """A trie node. Leaves are stored as ``(hash, key, value)`` tuples.
+    """
+    __slots__ = ('bitmap', 'entries')
+
+    def __init__(self, bitmap, entries):
+        self.bitmap = bitmap
+        self.entries = entries
+
+    def get(self, shift, h, key, default):
+        bit = _bit(h, shift)
+        if not self.bitmap & bit:
+            return default
+        entry = self.entries[_index(self.bitmap, bit)]
+        if entry.__class__ is tuple:
+            if entry[0] == h and entry[1] == key:
+                return entry[2]
+            return default
+        return entry.get(shift + BITS, h, key, default)
+
+    def assoc(self, shift, h, key, value):
+        """Return ``(node, added)`` where `added` is true for a new key.
+        """
+        bit = _bit(h, shift)
+        idx = _index(self.bitmap, bit)
+        entries = self.entries
+        if not self.bitmap & bit:
+            return _BitmapNode(
+                self.bitmap | bit,
+                entries[:idx] + ((h, key, value),) + entries[idx:]
+            ), True
+
+        entry = entries[idx]
+        if entry.__class__ is tuple:
+            if entry[0] == h and entry[1] == key:
+                if entry[2] is value:
+                    return self, False
+                new_entry, added = (h, key, value), False
+            else:
+                new_entry = _merge_leaves(shift + BITS, entry, (h, key, value))
+                added = True
+        else:
+            new_entry, added = entry.assoc(shift + BITS, h, key, value)
+            if new_entry is entry:
+                return self, False
+        return _BitmapNode(
+            self.bitmap,
+            entries[:idx] + (new_entry,) + entries[idx + 1:]
+        ), added
+
+    def without(self, shift, h, key):
+        """Return the node without `key`, or None if it would be empty.
+        """
+        bit = _bit(h, shift)
+        if not self.bitmap & bit:
+            return self
+        idx = _index(self.bitmap, bit)
+        entries = self.entries
+        entry = entries[idx]
+        if entry.__class__ is tuple:
+            if entry[0] != h or entry[1] != key:
+                return self
+            new_entry = None
+        else:
+            new_entry = entry.without(shift + BITS, h, key)
+            if new_entry is entry:
+                return self
+            if (new_entry is not None and len(new_entry.entries) == 1
+                    and new_entry.entries[0].__class__ is tuple):
+                # Pull a lone leaf up to this level.
+                new_entry = new_entry.entries[0]
+
+        if new_entry is None:
+            if self.bitmap == bit:
+                return None
+            return _BitmapNode(self.bitmap ^ bit, entries[:idx] + entries[idx + 1:])
+        return _BitmapNode(
+            self.bitmap,
+            entries[:idx] + (new_entry,) + entries[idx + 1:]
+        )
+
+    def iteritems(self):
+        for entry in self.entries:
+            if entry.__class__ is tuple:
+                yield entry[1], entry[2]
+            else:
+                for item in entry.iteritems():
+                    yield item
+
+
+class _CollisionNode(object):
+    """A node for keys whose hashes collide on every bit.
+    """
+    __slots__ = ('hash', 'entries')
+
+    def __init__(self, h, entries):
+        self.hash = h
+        self.entries = entries
+
+    def get(self, shift, h, key, default):
+        if h == self.hash:
+            for entry in self.entries:
+                if entry[1] == key:
+                    return entry[2]
+        return default
+
+    def assoc(self, shift, h, key, value):
+        if h != self.hash:
+            return _BitmapNode(_bit(self.hash, shift), (self,)).assoc(shift, h, key, value)
+        entries = self.entries
+        for idx, entry in enumerate(entries):
+            if entry[1] == key:
+                if entry[2] is value:
+                    return self, False
+                return _CollisionNode(
+                    h,
+                    entries[:idx] + ((h, key, value),) + entries[idx + 1:]
+                ), False
+        return _CollisionNode(h, entries + ((h, key, value),)), True
+
+    def without(self, shift, h, key):
+        if h != self.hash:
+            return self
+        entries = tuple(entry for entry in self.entries if entry[1] != key)
+        if len(entries) == len(self.entries):
+            return self
+        elif len(entries) == 1:
+            return _BitmapNode(_bit(h, shift), entries)
+        return _CollisionNode(h, entries)
+
+    def iteritems(self):
+        for entry in self.entries:
+            yield entry[1], entry[2]
+
+
+_EMPTY_NODE = _BitmapNode(0, ())
+
+
+class PersistentMap(Mapping):
+    """An immutable mapping with cheap, structure-sharing updates.
+
+    `set`, `delete` and `merge` return new maps, leaving the original intact.
+    """
+    __slots__ = ('_root', '_count')
+
+    def __init__(self, *args, **kwargs):
+        self._root = _EMPTY_NODE
+        self._count = 0
+        if args or kwargs:
+            root, count = self._root, self._count
+            for key, value in dict(*args, **kwargs).iteritems():
+                root, added = root.assoc(0, _hash(key), key, value)
+                count += added
+            self._root, self._count = root, count
+
+    @classmethod
+    def _make(cls, root, count):
+        pmap = cls.__new__(cls)
+        pmap._root = root
+        pmap._count = count
+        return pmap
+
+    def __getitem__(self, key):
+        value = self._root.get(0, _hash(key), key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def get(self, key, default=None):
+        return self._root.get(0, _hash(key), key, default)
+
+    def __contains__(self, key):
+        return self._root.get(0, _hash(key), key, _MISSING) is not _MISSING
+
+    def __len__(self):
+        return self._count
+
+    def __iter__(self):
+        for key, _ in self._root.iteritems():
+            yield key
+
+    def iteritems(self):
+        return self._root.iteritems()
+
+    def items(self):
+        return list(self._root.iteritems())
+
+    def set(self, key, value):
+        """Return a new map with `key` set to `value`.
+        """
+        root, added = self._root.assoc(0, _hash(key), key, value)
+        if root is self._root:
+            return self
+        return self._make(root, self._count + added)
+
+    def delete(self, key):
+        """Return a new map without `key`. Raises KeyError if it is missing.
+        """
+        root = self._root.without(0, _hash(key), key)
+        if root is self._root:
+            raise KeyError(key)
+        return self._make(root or _EMPTY_NODE, self._count - 1)
+
+    def merge(self, *args, **kwargs):
+        """Return a new map updated from the given mapping and/or keywords.
+        """
+        root, count = self._root, self._count
+        for key, value in dict(*args, **kwargs).iteritems():
+            root, added = root.assoc(0, _hash(key), key, value)
+            count += added
+        if root is self._root:
+            return self
+        return self._make(root, count)
+
+    def __repr__(self):
+        return "{}({!r})".format(self.__class__.__name__, dict(self.iteritems()))
+
@@ -0,0 +1,256 @@
+# -*- coding: utf-8 -*-
+"""nonobvious.primitives -- Conversion of entities to and from primitive values.
+
+Each Entity class gets its own `EntityCodec`, compiled from its fields the
+first time it is needed. The codec knows ahead of time how to convert each
+field, so values of simple fields are passed straight through and the rest go
+directly to their field's converter, with no type dispatch per value.
+
+Primitive structures use only dicts, lists, strings, numbers, booleans and
+None, so they can be handed to `json` or `msgpack` as is. Dates, times and
+datetimes become ISO 8601 strings.
+"""
+from collections import Mapping
+import datetime as dt
+import json
+
+from concon import frozendict, frozenlist
+from valideer import ValidationError
+
+from . import fields
+
+__all__ = ['EntityCodec', 'FixedOffset', 'from_primitive', 'get_codec',
+           'to_primitive']
+
+
+class FixedOffset(dt.tzinfo):
+    """A timezone at a fixed offset from UTC, for parsed datetimes.
+    """
+    def __init__(self, minutes):
+        self._offset = dt.timedelta(minutes=minutes)
+        self._minutes = minutes
+
+    def utcoffset(self, d):
+        return self._offset
+
+    def dst(self, d):
+        return dt.timedelta(0)
+
+    def tzname(self, d):
+        sign = '-' if self._minutes < 0 else '+'
+        return '%s%02d:%02d' % ((sign,) + divmod(abs(self._minutes), 60))
+
+    def __repr__(self):
+        return 'FixedOffset(%d)' % self._minutes
+
+
+def parse_date(value):
+    """Parse an ISO 8601 ``YYYY-MM-DD`` date.
+    """
+    if len(value) != 10 or value[4] != '-' or value[7] != '-':
+        raise ValueError("Invalid ISO 8601 date: %r" % value)
+    return dt.date(int(value[0:4]), int(value[5:7]), int(value[8:10]))
+
+
+def _parse_time_parts(value):
+    """Parse ``HH:MM:SS[.ffffff][+HH:MM]`` into time arguments.
+    """
+    tzinfo = None
+    if len(value) > 8 and value[-6] in '+-':
+        sign = -1 if value[-6] == '-' else 1
+        tzinfo = FixedOffset(sign * (int(value[-5:-3]) * 60 + int(value[-2:])))
+        value = value[:-6]
+    elif value.endswith('Z'):
+        tzinfo = FixedOffset(0)
+        value = value[:-1]
+    if value[2] != ':' or value[5] != ':':
+        raise ValueError("Invalid ISO 8601 time: %r" % value)
+    microsecond = 0
+    if len(value) > 8:
+        if value[8] != '.':
+            raise ValueError("Invalid ISO 8601 time: %r" % value)
+        microsecond = int(value[9:].ljust(6, '0')[:6])
+    return int(value[0:2]), int(value[3:5]), int(value[6:8]), microsecond, tzinfo
+
+
+def parse_time(value):
+    """Parse an ISO 8601 time, as written by `datetime.time.isoformat`.
+    """
+    return dt.time(*_parse_time_parts(value))
+
+
+def parse_datetime(value):
+    """Parse an ISO 8601 datetime, as written by `datetime.datetime.isoformat`.
+    """
+    if len(value) < 19 or value[10] not in 'T ':
+        raise ValueError("Invalid ISO 8601 datetime: %r" % value)
+    date = parse_date(value[:10])
+    return dt.datetime(date.year, date.month, date.day, *_parse_time_parts(value[11:]))
+
+
+def to_primitive(value):
+    """Convert any value to primitives, dispatching on its type.
+
+    Used for values of fields whose type doesn't tell us what they hold.
+    """
+    if hasattr(value, 'to_primitive'):
+        return value.to_primitive()
+    elif isinstance(value, Mapping):
+        return dict((key, to_primitive(item)) for key, item in value.iteritems())
+    elif isinstance(value, (list, tuple)):
+        return [to_primitive(item) for item in value]
+    elif isinstance(value, (dt.date, dt.time)):
+        return value.isoformat()
+    return value
+
+
+def from_primitive(value):
+    """Freeze plain containers found in a primitive value.
+    """
+    if isinstance(value, dict):
+        return frozendict((key, from_primitive(item)) for key, item in value.iteritems())
+    elif isinstance(value, list):
+        return frozenlist(from_primitive(item) for item in value)
+    return value
+
+
+def _isoformat(value):
+    return value.isoformat()
+
+
+class EntityCodec(object):
+    """Converts entities of one class to and from primitive structures.
+
+    Use `get_codec` (or the methods on `Entity`) to get the shared codec for
+    a class rather than instantiating this directly.
+    """
+    def __init__(self, entity_class):
+        self.entity_class = entity_class
+        self.encoders = {}
+        self.decoders = {}
+        self.trusted_decoders = {}
+        for name, field in entity_class.fields.iteritems():
+            self.encoders[name], self.decoders[name] = self.get_converters(field)
+            self.trusted_decoders[name] = self.get_converters(field, trusted=True)[1]
+
+    def get_converters(self, field, trusted=False):
+        """Return ``(encoder, decoder)`` for the field; None means as is.
+        """
+        if isinstance(field, (fields.Boolean, fields.Integer, fields.String)):
+            return None, None
+        elif isinstance(field, fields.Embedded):
+            return self._embedded_encoder, self._get_embedded_decoder(field, trusted)
+        elif isinstance(field, fields.ListField):
+            return list, field.container
+        elif isinstance(field, fields.DateTime):
+            return _isoformat, parse_datetime
+        elif isinstance(field, fields.Date):
+            return _isoformat, parse_date
+        elif isinstance(field, fields.Time):
+            return _isoformat, parse_time
+        return to_primitive, from_primitive
+
+    @staticmethod
+    def _embedded_encoder(value):
+        return value.to_primitive()
+
+    @staticmethod
+    def _get_embedded_decoder(field, trusted):
+        def build(value):
+            return get_codec(field.entity).decode(value, trusted)
+
+        def decode(value):
+            entity_class = field.entity
+            if isinstance(value, (entity_class, fields.LazyEntity)):
+                return value
+            if field.lazy:
+                return fields.LazyEntity(entity_class, value, build)
+            return build(value)
+        return decode
+
+    def encode(self, entity):
+        """Return a primitive dict holding the entity's members.
+        """
+        encoders = self.encoders
+        data = {}
+        for key, value in entity.iteritems():
+            encoder = encoders.get(key, to_primitive)
+            data[key] = value if encoder is None else encoder(value)
+        return data
+
+    def decode(self, data, trusted=False):
+        """Build an entity from a primitive dict.
+
+        The result is validated as usual, unless `trusted` is true, in which
+        case the data must have come from `encode` (see `Entity.trusted`).
+        """
+        decoders = self.trusted_decoders if trusted else self.decoders
+        values = {}
+        for key, value in data.iteritems():
+            decoder = decoders.get(key, from_primitive)
+            if decoder is not None and value is not None:
+                value = self._decode_value(decoder, key, value)
+            values[key] = value
+        if trusted:
+            return self.entity_class.trusted(values)
+        return self.entity_class(values)
+
+    @staticmethod
+    def _decode_value(decoder, key, value):
+        try:
+            return decoder(value)
+        except ValidationError as ex:
+            raise ex.add_context(key)
+        except (ValueError, TypeError) as ex:
+            raise ValidationError(str(ex), value).add_context(key)
+
+    def encode_value(self, key, value):
+        """Return the primitive form of a single member.
+        """
+        encoder = self.encoders.get(key, to_primitive)
+        return value if encoder is None else encoder(value)
+
+    def decode_value(self, key, value, trusted=False):
+        """Convert a single member back from its primitive form.
+
+        Unless `trusted`, the result still needs validating against its
+        field (embedded entities are validated as they are built).
+        """
+        decoder = (self.trusted_decoders if trusted else self.decoders).get(key, from_primitive)
+        if decoder is None or value is None:
+            return value
+        return self._decode_value(decoder, key, value)
+
+    def to_json(self, entity):
+        """Serialize the entity as JSON.
+        """
+        return json.dumps(self.encode(entity), separators=(',', ':'))
+
+    def from_json(self, text, trusted=False):
+        """Build an entity from JSON written by `to_json`.
+        """
+        return self.decode(json.loads(text), trusted)
+
+    def to_msgpack(self, entity):
+        """Serialize the entity with msgpack. Requires the `msgpack` package.
+        """
+        import msgpack
+        return msgpack.packb(self.encode(entity), use_bin_type=True)
+
+    def from_msgpack(self, packed, trusted=False):
+        """Build an entity from msgpack written by `to_msgpack`.
+
+        Requires the `msgpack` package.
+        """
+        import msgpack
+        return self.decode(msgpack.unpackb(packed, raw=False), trusted)
+
+
+def get_codec(entity_class):
+    """Return the codec for the Entity class, compiling it on first use.
+    """
+    codec = entity_class.__dict__.get('_codec')
+    if codec is None:
+        codec = EntityCodec(entity_class)
+        setattr(entity_class, '_codec', codec)
+    return codec
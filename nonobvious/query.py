@@ -0,0 +1,217 @@
+# -*- coding: utf-8 -*-
+"""nonobvious.query -- Declarative queries over collections of entities.
+
+Build a query from any iterable of entities::
+
+    query = Query(people).where(age__gte=18, city='Chicago').order_by('-age')
+    adults = list(query.limit(10))
+
+Conditions are given as ``field=value`` or ``field__op=value``, where `op` is
+one of ``eq``, ``ne``, ``lt``, ``lte``, ``gt``, ``gte`` or ``in``. All the
+conditions of a query are compiled together into a single function, so each
+entity is tested with one call rather than through a chain of wrappers.
+Entities missing a field never match a condition on it, except ``ne``.
+
+When the source is an `IndexedCollection`, one condition on an indexed field
+is answered from its index, and only the entities found there are tested.
+
+Queries are lazy: nothing is evaluated until the query is iterated, and,
+unless it is ordered, entities are produced as they are found.
+"""
+from itertools import islice
+
+from .indexes import IndexedCollection, SortedIndex
+
+__all__ = ['Query']
+
+
+class MISSING: pass
+
+
+OPERATORS = {
+    'eq': '==',
+    'ne': '!=',
+    'lt': '<',
+    'lte': '<=',
+    'gt': '>',
+    'gte': '>=',
+    'in': 'in',
+}
+
+
+def parse_condition(spec, value):
+    """Split ``field__op`` into ``(field, op)``.
+    """
+    name, _, op = spec.partition('__')
+    op = op or 'eq'
+    if op not in OPERATORS:
+        raise ValueError("Unknown operator %r in %r." % (op, spec))
+    if op == 'in':
+        value = frozenset(value)
+    return (name, op, value)
+
+
+def compile_predicate(conditions, predicates=()):
+    """Compile conditions, as ``(field, op, value)``, and any extra predicate
+    callables into a single function of one entity.
+    """
+    lines = ['def predicate(entity):', '    get = entity.get']
+    namespace = {}
+    for number, (name, op, value) in enumerate(conditions):
+        namespace['k%d' % number] = name
+        namespace['c%d' % number] = value
+        lines.append('    v = get(k%d, MISSING)' % number)
+        if op == 'ne':
+            lines.append('    if v is not MISSING and v == c%d: return False' % number)
+        elif op in ('eq', 'in'):
+            lines.append('    if v is MISSING or not v %s c%d: return False' % (OPERATORS[op], number))
+        else:
+            lines.append('    if v is MISSING or v is None or not v %s c%d: return False' % (
+                OPERATORS[op], number))
+    for number, function in enumerate(predicates):
+        namespace['p%d' % number] = function
+        lines.append('    if not p%d(entity): return False' % number)
+    lines.append('    return True')
+    namespace['MISSING'] = MISSING
+    exec compile('\n'.join(lines), '<query predicate>', 'exec') in namespace
+    return namespace['predicate']
+
+
+class Query(object):
+    """A lazy, declarative query over an iterable of entities.
+
+    Each method returns a new query; the original is left unchanged.
+    """
+    def __init__(self, source):
+        self.source = source
+        self.conditions = ()
+        self.predicates = ()
+        self.ordering = ()
+        self.count_limit = None
+
+    def _clone(self, **changes):
+        query = self.__class__.__new__(self.__class__)
+        query.__dict__.update(self.__dict__)
+        query.__dict__.update(changes)
+        if 'conditions' in changes or 'predicates' in changes:
+            query.__dict__.pop('_predicate', None)
+        return query
+
+    @property
+    def predicate(self):
+        """The function testing an entity against all of the query's
+        conditions and predicates, or None if there are none.
+
+        It is compiled on first use and kept for the life of the query.
+        """
+        try:
+            return self._predicate
+        except AttributeError:
+            pass
+        predicate = None
+        if self.conditions or self.predicates:
+            predicate = compile_predicate(self.conditions, self.predicates)
+        self._predicate = predicate
+        return predicate
+
+    def where(self, *predicates, **conditions):
+        """Narrow the query to entities matching all the given conditions and
+        predicate callables.
+        """
+        return self._clone(
+            conditions=self.conditions + tuple(
+                parse_condition(spec, value)
+                for spec, value in sorted(conditions.iteritems())
+            ),
+            predicates=self.predicates + predicates,
+        )
+
+    def order_by(self, *names):
+        """Order results by the named fields; prefix a name with ``-`` to
+        sort descending. A missing field sorts as if it were None.
+        """
+        return self._clone(ordering=self.ordering + names)
+
+    def limit(self, count):
+        """Produce at most `count` results.
+        """
+        return self._clone(count_limit=count)
+
+    def _candidates(self):
+        """Return entities that may match, using an index if one applies.
+        """
+        source = self.source
+        if not isinstance(source, IndexedCollection):
+            return source
+        # Prefer an equality lookup; otherwise use the first index that helps.
+        keys = None
+        for name, op, value in self.conditions:
+            index = source.indexes.get(name)
+            if index is None:
+                continue
+            if op == 'eq':
+                keys = index.lookup(value)
+                break
+            elif keys is not None:
+                continue
+            elif op == 'in':
+                keys = set()
+                for item in value:
+                    keys.update(index.lookup(item))
+            elif op in ('lt', 'lte') and isinstance(index, SortedIndex):
+                keys = index.range(high=value)
+            elif op in ('gt', 'gte') and isinstance(index, SortedIndex):
+                keys = index.range(low=value)
+        # Take a snapshot, so that the collection can be changed while the
+        # results are iterated over.
+        if keys is None:
+            return list(source)
+        return [source[key] for key in keys]
+
+    def __iter__(self):
+        results = self._candidates()
+        predicate = self.predicate
+        if predicate is not None:
+            results = (entity for entity in results if predicate(entity))
+        if self.ordering:
+            results = list(results)
+            for name in reversed(self.ordering):
+                descending = name.startswith('-')
+                name = name.lstrip('-')
+                results.sort(key=lambda entity: entity.get(name), reverse=descending)
+        if self.count_limit is not None:
+            results = islice(results, self.count_limit)
+        return iter(results)
+
+    def all(self):
+        """Return all the results as a list.
+        """
+        return list(self)
+
+    def first(self, default=None):
+        """Return the first result, or `default` if there is none.
+        """
+        for entity in self:
+            return entity
+        return default
+
+    def count(self):
+        """Count the results.
+        """
+        return sum(1 for entity in self)
+
+    def group_by(self, name):
+        """Return a dict mapping each value of the named field to a list of
+        the results holding it, in order.
+        """
+        groups = {}
+        for entity in self:
+            groups.setdefault(entity.get(name), []).append(entity)
+        return groups
+
+    def __repr__(self):
+        return "{}({} conditions, {} predicates)".format(
+            self.__class__.__name__,
+            len(self.conditions),
+            len(self.predicates)
+        )
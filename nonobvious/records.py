@@ -0,0 +1,270 @@
+# -*- coding: utf-8 -*-
+"""nonobvious.records -- Fixed-size binary records for simple entities.
+
+A `RecordFormat` packs entities whose fields are all Integer, Boolean, Date,
+DateTime or (length-limited) String fields into fixed-size binary records.
+Since every field sits at a known offset, a `RecordView` over any buffer --
+a string, bytearray, memoryview or mmap -- decodes just the fields you ask
+for, without building the whole entity.
+"""
+import datetime as dt
+import struct
+
+from . import fields
+from .primitives import FixedOffset
+
+__all__ = ['RecordFormat', 'RecordView']
+
+
+EPOCH = dt.datetime(1970, 1, 1)
+NAIVE = -0x8000  # Offset marker for naive datetimes
+FLAGS = struct.Struct('<B')
+
+
+class FieldLayout(object):
+    """How one field's value is laid out within a record.
+    """
+    def __init__(self, index, field, code, encode, decode):
+        self.index = index
+        self.field = field
+        self.code = code
+        self.encode = encode
+        self.decode = decode
+        self.offset = None
+        self.struct = struct.Struct('<' + code)
+        self.empty = self.struct.unpack(b'\0' * self.struct.size)
+        self.count = len(self.empty)
+
+
+def _encode_datetime(value):
+    offset = value.utcoffset()
+    if offset is None:
+        minutes = NAIVE
+    else:
+        minutes = offset.days * 24 * 60 + offset.seconds // 60
+        value = value.replace(tzinfo=None) - offset
+    delta = value - EPOCH
+    return ((delta.days * 86400 + delta.seconds) * 1000000 + delta.microseconds, minutes)
+
+
+def _decode_datetime(values):
+    microseconds, minutes = values
+    value = EPOCH + dt.timedelta(microseconds=microseconds)
+    if minutes == NAIVE:
+        return value
+    return (value + dt.timedelta(minutes=minutes)).replace(tzinfo=FixedOffset(minutes))
+
+
+def _get_string_codec(size):
+    def encode(value):
+        if isinstance(value, unicode):
+            encoded = value.encode('utf-8')
+        else:
+            encoded = value
+        if len(encoded) > size:
+            raise ValueError("String is longer than %d bytes: %r" % (size, value))
+        return (len(encoded), encoded)
+
+    def decode(values):
+        return values[1][:values[0]].decode('utf-8')
+
+    return encode, decode
+
+
+def get_layout(index, field, string_size):
+    """Return the `FieldLayout` for a field, or raise TypeError.
+    """
+    if isinstance(field, fields.Boolean):
+        return FieldLayout(index, field, '?', lambda v: (v,), lambda t: t[0])
+    elif isinstance(field, fields.Integer):
+        return FieldLayout(index, field, 'q', lambda v: (v,), lambda t: t[0])
+    elif isinstance(field, fields.DateTime):
+        return FieldLayout(index, field, 'qh', _encode_datetime, _decode_datetime)
+    elif isinstance(field, fields.Date):
+        return FieldLayout(
+            index, field, 'i',
+            lambda v: (v.toordinal(),),
+            lambda t: dt.date.fromordinal(t[0])
+        )
+    elif isinstance(field, fields.String):
+        encode, decode = _get_string_codec(string_size)
+        return FieldLayout(index, field, 'H%ds' % string_size, encode, decode)
+    raise TypeError("%s fields can't be stored in a binary record." % field.__class__.__name__)
+
+
+class RecordView(object):
+    """A read-only view of one packed record within a buffer.
+
+    Fields are decoded from the buffer each time they are read. Views made by
+    a `RecordFormat` also expose each field as an attribute, except fields
+    named like one of the view's methods, which are only available by key.
+    """
+    __slots__ = ('_format', '_buffer', '_offset')
+
+    def __init__(self, format, buffer, offset=0):
+        self._format = format
+        self._buffer = buffer
+        self._offset = offset
+
+    def is_present(self, name):
+        layout = self._format.layouts[name]
+        flags = FLAGS.unpack_from(self._buffer, self._offset + layout.index // 8)[0]
+        return bool(flags & (1 << (layout.index % 8)))
+
+    def get(self, name, default=None):
+        if not self.is_present(name):
+            return default
+        layout = self._format.layouts[name]
+        return layout.decode(layout.struct.unpack_from(self._buffer, self._offset + layout.offset))
+
+    def __getitem__(self, name):
+        if name not in self._format.layouts or not self.is_present(name):
+            raise KeyError(name)
+        return self.get(name)
+
+    def materialize(self):
+        """Decode the whole record into an entity.
+        """
+        return self._format.unpack(self._buffer, self._offset)
+
+    def __repr__(self):
+        return "{}({!r}, offset={})".format(
+            self.__class__.__name__,
+            self._format.entity_class.__name__,
+            self._offset
+        )
+
+
+def _field_property(name):
+    def get(self):
+        return self.get(name, self._format.layouts[name].field.default)
+    return property(get)
+
+
+class RecordFormat(object):
+    """The fixed-size binary record layout for an Entity class.
+
+    Each String field holds at most `string_size` bytes of UTF-8, unless
+    overridden per field in `string_sizes`; `str` values are stored as they
+    are, `unicode` ones encoded. DateTimes keep their UTC offset. Values that
+    don't fit their field, such as integers beyond 64 bits, raise ValueError.
+    """
+    def __init__(self, entity_class, string_size=32, string_sizes=None):
+        self.entity_class = entity_class
+        string_sizes = string_sizes or {}
+        self.field_names = tuple(sorted(entity_class.fields))
+        self.flags_size = (len(self.field_names) + 7) // 8
+
+        self.layouts = {}
+        codes = ['%ds' % self.flags_size]
+        offset = self.flags_size
+        for index, name in enumerate(self.field_names):
+            layout = get_layout(
+                index,
+                entity_class.fields[name],
+                string_sizes.get(name, string_size)
+            )
+            layout.offset = offset
+            offset += layout.struct.size
+            codes.append(layout.code)
+            self.layouts[name] = layout
+        self.struct = struct.Struct('<' + ''.join(codes))
+        self.size = self.struct.size
+
+        self.view_class = type(
+            entity_class.__name__ + 'RecordView',
+            (RecordView,),
+            dict(
+                [(name, _field_property(name)) for name in self.field_names
+                 if not hasattr(RecordView, name)]
+                + [('__slots__', ())]
+            )
+        )
+
+    def _get_values(self, entity):
+        flags = bytearray(self.flags_size)
+        values = [None]
+        present = 0
+        for name in self.field_names:
+            layout = self.layouts[name]
+            if name in entity:
+                present += 1
+                flags[layout.index // 8] |= 1 << (layout.index % 8)
+                values.extend(layout.encode(entity[name]))
+            else:
+                values.extend(layout.empty)
+        if present != len(entity):
+            additional = [key for key in entity if key not in self.layouts]
+            raise ValueError("Members can't be stored in a binary record: %s" % additional)
+        values[0] = bytes(flags)
+        return values
+
+    def _get_pack_error(self, values):
+        """Return a ValueError naming the field whose value `struct` rejected,
+        or None if they all fit.
+        """
+        position = 1
+        for name in self.field_names:
+            layout = self.layouts[name]
+            try:
+                layout.struct.pack(*values[position:position + layout.count])
+            except struct.error as ex:
+                return ValueError("%s can't be stored in a binary record: %s" % (name, ex))
+            position += layout.count
+        return None
+
+    def pack(self, entity):
+        """Return the entity packed into a binary record.
+        """
+        values = self._get_values(entity)
+        try:
+            return self.struct.pack(*values)
+        except struct.error:
+            error = self._get_pack_error(values)
+            if error is None:
+                raise
+            raise error
+
+    def pack_into(self, buffer, offset, entity):
+        """Pack the entity into a writable buffer at `offset`.
+        """
+        values = self._get_values(entity)
+        try:
+            self.struct.pack_into(buffer, offset, *values)
+        except struct.error:
+            error = self._get_pack_error(values)
+            if error is None:
+                raise
+            raise error
+
+    def unpack(self, buffer, offset=0):
+        """Decode the record at `offset` into an entity.
+        """
+        values = self.struct.unpack_from(buffer, offset)
+        flags = bytearray(values[0])
+        data = {}
+        position = 1
+        for name in self.field_names:
+            layout = self.layouts[name]
+            if flags[layout.index // 8] & (1 << (layout.index % 8)):
+                data[name] = layout.decode(values[position:position + layout.count])
+            position += layout.count
+        return self.entity_class.trusted(data)
+
+    def view(self, buffer, offset=0):
+        """Return a `RecordView` of the record at `offset`.
+        """
+        return self.view_class(self, buffer, offset)
+
+    def scan(self, buffer, offset=0):
+        """Yield a view of each record in the buffer, starting at `offset`.
+        """
+        view_class = self.view_class
+        for position in xrange(offset, len(buffer) - self.size + 1, self.size):
+            yield view_class(self, buffer, position)
+
+    def write(self, stream, entities):
+        """Pack each entity and write it to a file-like object.
+        """
+        for entity in entities:
+            stream.write(self.pack(entity))
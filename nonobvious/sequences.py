@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+"""nonobvious.sequences -- Compact, immutable sequences for list fields.
+
+`frozenarray` packs integers into a single buffer of C longs (64 bits on
+LP64 platforms; Python 2's `array` has no ``'q'`` typecode), and
+`internedtuple` holds strings in a tuple, sharing equal `str` values through
+``intern``. Both compare equal to lists and tuples holding the same items,
+like `frozenlist`, so they can stand in for it. Use them via the `compact`
+option of `IntegerList` and `StringList`.
+"""
+from array import array
+from collections import Sequence
+
+from concon import define_constrained_subtype
+
+__all__ = ['frozenarray', 'internedtuple']
+
+
+TYPECODE = 'l'
+
+
+def _array_new(cls, values=()):
+    return array.__new__(cls, TYPECODE, values)
+
+
+def _array_eq(self, other):
+    if isinstance(other, array):
+        return array.__eq__(self, other)
+    elif isinstance(other, (list, tuple)):
+        return self.tolist() == list(other)
+    return NotImplemented
+
+
+def _array_ne(self, other):
+    equal = _array_eq(self, other)
+    if equal is NotImplemented:
+        return equal
+    return not equal
+
+
+def _array_hash(self):
+    return hash(tuple(self))
+
+
+def _array_reduce(self):
+    return (self.__class__, (self.tolist(),))
+
+
+def _array_buffer(self):
+    """Return a read-only buffer over the packed values, without copying.
+
+    For example, ``numpy.frombuffer(values.buffer(), numpy.int_)``.
+    """
+    return buffer(self)
+
+
+def _array_repr(self):
+    return '%s(%r)' % (self.__class__.__name__, self.tolist())
+
+
+frozenarray = define_constrained_subtype(
+    'frozen', array,
+    ['__delitem__', '__delslice__', '__iadd__', '__imul__', '__setitem__',
+     '__setslice__', 'append', 'byteswap', 'extend', 'fromfile', 'fromlist',
+     'fromstring', 'fromunicode', 'insert', 'pop', 'remove', 'reverse'],
+    {
+        '__doc__': 'Holds integers packed as C longs in a single buffer.',
+        '__module__': __name__,
+        '__slots__': (),
+        '__new__': _array_new,
+        '__eq__': _array_eq,
+        '__ne__': _array_ne,
+        '__hash__': _array_hash,
+        '__reduce__': _array_reduce,
+        '__repr__': _array_repr,
+        'buffer': _array_buffer,
+    })
+
+Sequence.register(frozenarray)
+
+
+class internedtuple(tuple):
+    """A tuple of strings, with equal `str` items shared via ``intern``.
+    """
+    __slots__ = ()
+
+    def __new__(cls, values=()):
+        return tuple.__new__(cls, [
+            intern(value) if type(value) is str else value
+            for value in values
+        ])
+
+    def __eq__(self, other):
+        if isinstance(other, list):
+            return list(self) == other
+        return tuple.__eq__(self, other)
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        if equal is NotImplemented:
+            return equal
+        return not equal
+
+    __hash__ = tuple.__hash__
+
+    def __getnewargs__(self):
+        return (tuple(self),)
+
+    def __repr__(self):
+        return '%s(%r)' % (self.__class__.__name__, list(self))
@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+"""nonobvious.transients -- Mutable drafts for batching changes to an entity.
+
+Rather than chaining `copy` calls, each of which builds and validates a new
+instance, take a draft, change it as often as needed, and freeze it::
+
+    draft = order.transient()
+    draft['status'] = 'shipped'
+    draft.update(shipped=now, carrier='UPS')
+    del draft['hold']
+    order = draft.freeze()
+
+Changed members are validated once, when the draft is frozen, and the new
+entity is built in one step. A frozen draft can no longer be used, so the
+entity it produced can't be changed through it.
+"""
+from collections import MutableMapping
+
+from concon import ConstraintError
+from valideer import ValidationError
+
+__all__ = ['Transient']
+
+
+class Transient(MutableMapping):
+    """A mutable draft of an entity; see `BaseEntity.transient`.
+
+    The draft reads as the entity with the changes made so far applied.
+    Values are only validated by `freeze`, so until then they read back
+    exactly as they were set.
+    """
+    __slots__ = ('_entity', '_changes', '_removed')
+
+    def __init__(self, entity):
+        self._entity = entity
+        self._changes = {}
+        self._removed = set()
+
+    def _check(self):
+        if self._entity is None:
+            raise ConstraintError("This draft has been frozen.")
+
+    @property
+    def entity(self):
+        """The entity this draft was taken from.
+        """
+        self._check()
+        return self._entity
+
+    def __getitem__(self, key):
+        self._check()
+        try:
+            return self._changes[key]
+        except KeyError:
+            if key in self._removed:
+                raise
+        return self._entity[key]
+
+    def __setitem__(self, key, value):
+        self._check()
+        self._changes[key] = value
+        self._removed.discard(key)
+
+    def __delitem__(self, key):
+        if key not in self:
+            raise KeyError(key)
+        self._changes.pop(key, None)
+        if key in self._entity:
+            self._removed.add(key)
+
+    def __contains__(self, key):
+        self._check()
+        if key in self._changes:
+            return True
+        return key not in self._removed and key in self._entity
+
+    def __iter__(self):
+        self._check()
+        changes = self._changes
+        removed = self._removed
+        for key in self._entity:
+            if key not in changes and key not in removed:
+                yield key
+        for key in changes:
+            yield key
+
+    def __len__(self):
+        return sum(1 for key in self)
+
+    def freeze(self):
+        """Validate the changes and return the new entity.
+
+        Returns the original entity if nothing was changed. If validation
+        fails, the draft is left as it was, to be corrected and frozen again.
+        """
+        self._check()
+        entity = self._entity
+        cls = entity.__class__
+        if not self._changes and not self._removed:
+            result = entity
+        else:
+            fields = cls.fields
+            missing = [
+                key for key in self._removed
+                if key in fields and fields[key].required
+            ]
+            if missing:
+                raise ValidationError("missing required properties: %s" % missing, None)
+            changes = cls._validate_changes(self._changes)
+            if self._removed:
+                data = dict(entity.iteritems())
+                for key in self._removed:
+                    del data[key]
+                data.update(changes)
+                result = cls._from_validated(data)
+            else:
+                result = entity._evolve(changes)
+                entity._carry_computed(result, changes)
+            if cls.interned:
+                result = cls.intern(result)
+        self._entity = self._changes = self._removed = None
+        return result
+
+    def __repr__(self):
+        if self._entity is None:
+            return "{}(<frozen>)".format(self.__class__.__name__)
+        return "{}({!r})".format(self.__class__.__name__, dict(self.iteritems()))
@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+"""tests for bulk entity construction
+"""
+import unittest
+
+from ensure import ensure
+
+
+class BulkLoaderTests(unittest.TestCase):
+    def setUp(self):
+        from nonobvious import entities
+        from nonobvious import fields
+
+        class MyBulkEntity(entities.Entity):
+            foo = fields.String(required=True)
+            bar = fields.Integer(default=2)
+
+        self.MyBulkEntity = MyBulkEntity
+
+    def test_it_should_lazily_build_entities(self):
+        rows = iter([{'foo': 'a'}, {'foo': 'b', 'bar': 3}])
+        loader = self.MyBulkEntity.bulk(rows)
+        ensure(loader.read).equals(0)
+
+        entities = list(loader)
+        ensure(entities).equals([{'foo': 'a', 'bar': 2}, {'foo': 'b', 'bar': 3}])
+        ensure(entities[0]).is_a(self.MyBulkEntity)
+        ensure(loader.read).equals(2)
+        ensure(loader.loaded).equals(2)
+        ensure(loader.failed).equals(0)
+
+    def test_it_should_raise_validation_errors(self):
+        loader = self.MyBulkEntity.bulk([{'foo': 'a'}, {'foo': 1}])
+        ensure(list).called_with(loader).raises(self.MyBulkEntity.ValidationError)
+        ensure(loader.loaded).equals(1)
+        ensure(loader.failed).equals(1)
+
+    def test_it_should_collect_errors(self):
+        rows = [{'foo': 1}, {'foo': 'a'}, {'bar': 1}]
+        loader = self.MyBulkEntity.bulk(rows, collect_errors=True)
+        ensure(list(loader)).equals([{'foo': 'a', 'bar': 2}])
+        ensure(loader.failed).equals(2)
+        ensure([error.index for error in loader.errors]).equals([0, 2])
+        ensure(loader.errors[0].row).is_(rows[0])
+        ensure(loader.errors[0].error).is_a(self.MyBulkEntity.ValidationError)
+
+    def test_it_should_build_any_storage_flavor(self):
+        from nonobvious import entities
+        from nonobvious import fields
+
+        class MyCompactBulkEntity(entities.CompactEntity):
+            foo = fields.String()
+
+        loaded = list(MyCompactBulkEntity.bulk([{'foo': 'a'}]))
+        ensure(loaded[0]).is_a(MyCompactBulkEntity)
+        ensure(loaded[0].foo).equals('a')
+
+    def test_it_should_trust_rows_when_asked(self):
+        loader = self.MyBulkEntity.bulk([{'foo': 1}], trusted=True)
+        ensure(list(loader)).equals([{'foo': 1, 'bar': 2}])
+
+    def test_it_should_adapt_defaults_for_trusted_rows(self):
+        from nonobvious import entities
+        from nonobvious import fields
+
+        class MyListDefaultBulkEntity(entities.Entity):
+            ids = fields.IntegerList(default=())
+
+        rows = [{}]
+        ensure(list(MyListDefaultBulkEntity.bulk(rows, trusted=True))).equals(
+            list(MyListDefaultBulkEntity.bulk(rows)))
+
+    def test_it_should_validate_in_worker_processes(self):
+        rows = [{'foo': 'r%d' % n} if n % 10 else {'foo': n} for n in range(100)]
+        loader = self.MyBulkEntity.bulk(rows, collect_errors=True, processes=2, chunk_size=7)
+        loaded = list(loader)
+        ensure(loaded).equals([self.MyBulkEntity(foo='r%d' % n) for n in range(100) if n % 10])
+        ensure(loaded[0]).is_a(self.MyBulkEntity)
+        ensure(loader.read).equals(100)
+        ensure(loader.loaded).equals(90)
+        ensure([error.index for error in loader.errors]).equals(range(0, 100, 10))
+        ensure(loader.errors[1].row).is_(rows[10])
+        ensure(loader.errors[1].error).is_a(self.MyBulkEntity.ValidationError)
+        ensure(str(loader.errors[1].error)).contains('foo')
+
+        loader = self.MyBulkEntity.bulk(rows, collect_errors=True, processes=2, chunk_size=7, ordered=False)
+        ensure(sorted(entity.foo for entity in loader)).equals(sorted('r%d' % n for n in range(100) if n % 10))
+        ensure(loader.failed).equals(10)
+
+        loader = self.MyBulkEntity.bulk(rows, processes=2)
+        ensure(list).called_with(loader).raises(self.MyBulkEntity.ValidationError)
+
+    def test_it_should_load_the_same_entities_serially_and_in_parallel(self):
+        import datetime as dt
+        from nonobvious import entities
+        from nonobvious import fields
+
+        class MyBulkChild(entities.Entity):
+            day = fields.Date()
+
+        class MyBulkParent(entities.Entity):
+            id = fields.Integer(required=True)
+            meta = fields.Field()
+            tags = fields.StringList(default=())
+            child = fields.Embedded(entity=MyBulkChild)
+            later = fields.Embedded(entity=MyBulkChild, lazy=True)
+
+        rows = [
+            {'id': n, 'meta': dt.date(2014, 1, 1), 'extra': (1, 2),
+             'tags': ['a'], 'child': {'day': dt.date(2014, 1, n + 1)}, 'later': {}}
+            for n in range(20)
+        ]
+        serial = list(MyBulkParent.bulk(rows))
+        parallel = list(MyBulkParent.bulk(rows, processes=2, chunk_size=3))
+        ensure(parallel).equals(serial)
+        ensure(parallel[0].meta).is_a(dt.date)
+        ensure(parallel[0]['extra']).equals((1, 2))
+        ensure(parallel[0].child).is_a(MyBulkChild)
+        ensure(parallel[0].later).is_a(MyBulkChild)
+
+    def test_it_should_collect_build_errors_in_worker_processes(self):
+        from nonobvious import entities
+        from nonobvious import fields
+
+        class MyCompactBulkRowEntity(entities.CompactEntity):
+            foo = fields.String()
+            bar = fields.Integer(default=2)
+
+        rows = [{'foo': 'a'}, {'foo': 'b', 'bad': 1}, {'foo': 'c'}, {'bad': 2}]
+        serial = MyCompactBulkRowEntity.bulk(rows, collect_errors=True)
+        parallel = MyCompactBulkRowEntity.bulk(rows, collect_errors=True, processes=2, chunk_size=2)
+        ensure(list(parallel)).equals(list(serial))
+        ensure([error.index for error in parallel.errors]).equals([1, 3])
+        ensure([error.index for error in serial.errors]).equals([1, 3])
+        ensure(parallel.errors[0].row).is_(rows[1])
+        ensure(parallel.loaded).equals(2)
+
+    def test_it_should_send_back_only_non_default_members_from_workers(self):
+        from nonobvious.bulk import _validate_chunk
+
+        start, loaded, errors = _validate_chunk(
+            ('MyBulkEntity', 5, [{'foo': 'a'}, {'foo': 'b', 'bar': 3}, {'foo': 1}]))
+        ensure(start).equals(5)
+        ensure(loaded).equals([(5, {'foo': 'a'}), (6, {'foo': 'b', 'bar': 3})])
+        ensure([error[0] for error in errors]).equals([7])
@@ -180,6 +180,71 @@ class DateTimeFieldTests(unittest.TestCase):
         )
 
 
+class ListFieldTests(unittest.TestCase):
+    def test_it_should_reuse_validated_sequences(self):
+        from concon import frozenlist
+        from nonobvious import fields
+
+        validator = fields.StringList().get_validator()
+        tags = frozenlist(['a', 'b'])
+        ensure(validator.validate(tags)).is_(tags)
+        ensure(validator.validate(['a', 'b'])).is_a(frozenlist)
+        ensure(validator.validate).called_with(frozenlist(['a', 1])).raises(fields.V.ValidationError)
+        ensure(validator.validate).called_with('ab').raises(fields.V.ValidationError)
+
+    def test_it_should_share_sequences_between_versions(self):
+        from concon import frozenlist
+        from nonobvious import entities
+        from nonobvious import fields
+
+        class MyListEntity(entities.Entity):
+            ids = fields.IntegerList()
+            tags = fields.StringList(validator=lambda tags: len(tags) < 3)
+            name = fields.String()
+
+        entity = MyListEntity(ids=[1, 2], tags=['a'])
+        ensure(entity.tags).is_a(frozenlist)
+        ensure(entity.copy(ids=entity.ids, tags=entity.tags, name='b').ids).is_(entity.ids)
+        ensure(entity.copy(tags=entity.tags).tags).is_(entity.tags)
+        ensure(MyListEntity(entity).ids).is_(entity.ids)
+        ensure(MyListEntity(entity).tags).is_(entity.tags)
+
+
+class CompactListFieldTests(unittest.TestCase):
+    def setUp(self):
+        from nonobvious import entities
+        from nonobvious import fields
+
+        class MyCompactListEntity(entities.Entity):
+            ids = fields.IntegerList(compact=True)
+            tags = fields.StringList(compact=True)
+
+        self.MyCompactListEntity = MyCompactListEntity
+
+    def test_it_should_store_compact_sequences(self):
+        from nonobvious.sequences import frozenarray, internedtuple
+        tag = ''.join(['t', 'a', 'g'])
+        entity = self.MyCompactListEntity(ids=[1, 2, 3], tags=[tag, u'b'])
+        ensure(entity.ids).is_a(frozenarray)
+        ensure(entity.tags).is_a(internedtuple)
+        ensure(entity.tags[0]).is_(intern('tag'))
+        ensure(entity).equals({'ids': [1, 2, 3], 'tags': ['tag', u'b']})
+        ensure(entity.ids.append).called_with(4).raises(self.MyCompactListEntity.ConstraintError)
+
+        copied = entity.copy(ids=entity.ids)
+        ensure(copied.ids).is_a(frozenarray)
+        ensure(copied).equals(entity)
+        ensure(hash(copied)).equals(hash(entity))
+        ensure(self.MyCompactListEntity.from_primitive(entity.to_primitive())).equals(entity)
+
+    def test_it_should_validate_compact_sequences(self):
+        ValidationError = self.MyCompactListEntity.ValidationError
+        ensure(self.MyCompactListEntity).called_with(ids=[1, '2']).raises(ValidationError)
+        ensure(self.MyCompactListEntity).called_with(ids=[2 ** 70]).raises(ValidationError)
+        ensure(self.MyCompactListEntity).called_with(tags=[1]).raises(ValidationError)
+        ensure(self.MyCompactListEntity).called_with(tags='abc').raises(ValidationError)
+
+
 class EmbeddedFieldTests(unittest.TestCase):
     def setUp(self):
         from nonobvious import fields
@@ -229,3 +294,151 @@ class EmbeddedFieldTests(unittest.TestCase):
     def test_it_should_fail_on_missing_entity_definition(self):
         from nonobvious import fields
         ensure(fields.Embedded).called_with().raises(TypeError)
+
+    def test_it_should_defer_lazy_embedded_entities(self):
+        from nonobvious import fields
+        from nonobvious import entities
+
+        class MyLazyEmbeddingEntity(entities.Entity):
+            child = fields.Embedded(entity=self.MyEmbeddedEntity, lazy=True)
+            name = fields.String()
+
+        parent = MyLazyEmbeddingEntity(child={'foo': 2}, name='parent')
+        ensure(parent['child']).is_a(fields.LazyEntity)
+        ensure(parent['child'].materialized).is_false()
+        ensure(parent.name).equals('parent')
+
+        with ensure().raises(self.MyEmbeddedEntity.ValidationError):
+            parent.child
+        ensure(parent.validate).called_with().raises(self.MyEmbeddedEntity.ValidationError)
+
+        parent = MyLazyEmbeddingEntity(child={'foo': 'blah'})
+        ensure(parent['child'].materialized).is_false()
+        ensure(parent.child).is_an_instance_of(self.MyEmbeddedEntity)
+        ensure(parent.child).is_(parent.child)
+        ensure(parent['child'].materialized).is_true()
+        ensure(parent.validate()).is_(parent)
+        ensure(parent).equals(MyLazyEmbeddingEntity(child=self.MyEmbeddedEntity(foo='blah')))
+
+        ensure(MyLazyEmbeddingEntity).called_with(child=2).raises(self.MyEmbeddedEntity.ValidationError)
+
+    def test_it_should_share_embedded_entities_between_versions(self):
+        from nonobvious import fields
+        from nonobvious import entities
+
+        class MyOuterEntity(entities.Entity):
+            inner = fields.Embedded(entity=self.MyEmbeddingEntity)
+            name = fields.String()
+
+        outer = MyOuterEntity(inner={'child': {'foo': 'blah'}})
+        copied = outer.copy(name='copy', inner=outer.inner)
+        ensure(copied.inner).is_(outer.inner)
+        ensure(copied.inner.child).is_(outer.inner.child)
+        ensure(MyOuterEntity(outer).inner).is_(outer.inner)
+
+    def test_it_should_reuse_materialized_lazy_entities(self):
+        from nonobvious import fields
+        from nonobvious import entities
+
+        class MyLazyEmbeddingEntity(entities.Entity):
+            child = fields.Embedded(entity=self.MyEmbeddedEntity, lazy=True)
+
+        lazy = MyLazyEmbeddingEntity(child={'foo': 'blah'})['child']
+        parent = self.MyEmbeddingEntity(child=lazy)
+        ensure(parent['child']).is_(lazy.materialize())
+
+    def test_it_should_compare_invalid_lazy_entities_without_raising(self):
+        from nonobvious import fields
+        from nonobvious import entities
+
+        class MyLazyEmbeddingEntity(entities.Entity):
+            child = fields.Embedded(entity=self.MyEmbeddedEntity, lazy=True)
+
+        parent = MyLazyEmbeddingEntity(child={'foo': 2})
+        same = MyLazyEmbeddingEntity(child={'foo': 2})
+        other = MyLazyEmbeddingEntity(child={'foo': 3})
+        valid = MyLazyEmbeddingEntity(child={'foo': 'blah'})
+
+        ensure(parent == same).is_true()
+        ensure(parent['child'].materialized).is_false()
+        ensure(parent == other).is_false()
+        ensure(parent == valid).is_false()
+        ensure(parent != valid).is_true()
+        ensure(hash(parent)).equals(hash(same))
+        ensure(parent['child'] == self.MyEmbeddedEntity(foo='blah')).is_false()
+
+        built = MyLazyEmbeddingEntity(child=self.MyEmbeddedEntity(foo='blah'))
+        ensure(valid).equals(built)
+        ensure(hash(valid)).equals(hash(built))
+
+
+class ComputedFieldTests(unittest.TestCase):
+    def setUp(self):
+        from nonobvious import entities
+        from nonobvious import fields
+
+        calls = self.calls = []
+
+        def define(base):
+            class MyComputingEntity(base):
+                name = fields.String()
+                quantities = fields.IntegerList(default=())
+
+                @fields.computed(depends=['quantities'])
+                def total(self):
+                    calls.append('total')
+                    return sum(self.quantities)
+
+                @fields.computed()
+                def label(self):
+                    calls.append('label')
+                    return '%s: %s' % (self.name, self.total)
+
+            return MyComputingEntity
+
+        self.MyEntity = define(entities.Entity)
+        self.MyCompactEntity = define(entities.CompactEntity)
+
+    def test_it_should_compute_once_per_instance(self):
+        for cls in [self.MyEntity, self.MyCompactEntity]:
+            del self.calls[:]
+            entity = cls(name='order', quantities=[1, 2, 3])
+            ensure(self.calls).equals([])
+            ensure(entity.total).equals(6)
+            ensure(entity.total).equals(6)
+            ensure(entity.label).equals('order: 6')
+            ensure(self.calls).equals(['total', 'label'])
+
+    def test_it_should_not_be_a_member(self):
+        from nonobvious import fields
+
+        entity = self.MyEntity(name='order', quantities=[1, 2])
+        entity.total
+        ensure(entity).equals({'name': 'order', 'quantities': [1, 2]})
+        ensure('total' in entity).is_false()
+        ensure(entity.to_primitive()).equals({'name': 'order', 'quantities': [1, 2]})
+        ensure(self.MyEntity.fields).does_not_contain('total')
+        ensure(self.MyEntity.computed['total']).is_a(fields.Computed)
+        ensure(dict(self.MyEntity.validation_spec)).does_not_contain('total')
+        ensure(setattr).called_with(entity, 'total', 1).raises(entity.ConstraintError)
+
+    def test_it_should_recompute_on_copy_only_when_dependencies_change(self):
+        for cls in [self.MyEntity, self.MyCompactEntity]:
+            entity = cls(name='order', quantities=[1, 2, 3])
+            entity.label
+            del self.calls[:]
+
+            renamed = entity.copy(name='renamed')
+            ensure(renamed.total).equals(6)
+            ensure(renamed.label).equals('renamed: 6')
+            ensure(self.calls).equals(['label'])
+
+            del self.calls[:]
+            same = entity.copy(quantities=[1, 2, 3])
+            ensure(same.total).equals(6)
+            ensure(self.calls).equals([])
+
+            changed = entity.copy(quantities=[4])
+            ensure(changed.total).equals(4)
+            ensure(self.calls).equals(['total'])
+            ensure(entity.total).equals(6)
@@ -120,3 +120,632 @@ class EntityTests(unittest.TestCase):
 
         entity = MyEntity(foo='baz')
         ensure(repr(entity)).equals("MyEntity({'foo': 'baz'})")
+
+    def test_it_should_compile_its_validator_once(self):
+        from nonobvious import entities
+        from nonobvious import fields
+
+        class MyEntity(entities.Entity):
+            foo = fields.String()
+
+        validator = MyEntity.get_validator()
+        MyEntity(foo='bar')
+        MyEntity(foo='baz').copy(foo='blah')
+        ensure(MyEntity.get_validator()).is_(validator)
+
+    def test_it_should_generate_validation_matching_its_spec(self):
+        import datetime as dt
+        from pytz import utc
+        from nonobvious import entities
+        from nonobvious import fields
+
+        class MyGeneratedEntity(entities.Entity):
+            flag = fields.Boolean(default=False)
+            count = fields.Integer(required=True)
+            name = fields.String(choices=['a', 'b'])
+            day = fields.Date()
+            when = fields.DateTime()
+            ids = fields.IntegerList(default=())
+            tags = fields.StringList()
+            child = fields.Embedded(entity='MyGeneratedEntity')
+            anything = fields.Field()
+            nullable = fields.Field(validator=fields.V.Nullable('integer', 0))
+
+        ensure('_validate' in MyGeneratedEntity.__dict__).is_true()
+        ensure(MyGeneratedEntity._validate.source).contains('def _validate')
+        validator = MyGeneratedEntity.get_validator()
+        now = dt.datetime(2014, 1, 1, tzinfo=utc)
+        cases = [
+            {'count': 1},
+            {'count': 1L, 'flag': True, 'name': 'a', 'day': now, 'when': now,
+             'ids': (1, 2L), 'tags': [u'x', 'y'], 'child': {'count': 2}, 'anything': [1]},
+            {'count': 1, 'ids': fields.frozenlist([1]), 'extra': object()},
+            {},
+            {'count': '1'},
+            {'count': True},
+            {'count': 1, 'flag': 1},
+            {'count': 1, 'name': 'c'},
+            {'count': 1, 'when': dt.datetime(2014, 1, 1)},
+            {'count': 1, 'ids': [1, '2']},
+            {'count': 1, 'tags': 'xy'},
+            {'count': 1, 'child': {'count': 'x'}},
+            {'count': 1, 'nullable': None},
+            {'count': 1, 'nullable': 'x'},
+        ]
+        for case in cases:
+            try:
+                expected = validator.validate(MyGeneratedEntity._merge((case,), {}))
+            except MyGeneratedEntity.ValidationError as ex:
+                with ensure().raises(MyGeneratedEntity.ValidationError) as raised:
+                    MyGeneratedEntity._validate((case,), {})
+                ensure(str(raised.exception)).equals(str(ex))
+            else:
+                validated = MyGeneratedEntity._validate((case,), {})
+                ensure(validated).equals(expected)
+                ensure(map(type, validated.values())).equals(map(type, expected.values()))
+        ensure(MyGeneratedEntity._validate(({'count': 1},), {})['nullable']).equals(0)
+
+    def test_it_should_compile_forward_references_lazily(self):
+        from nonobvious import entities
+        from nonobvious import fields
+
+        class MyForwardEmbeddingEntity(entities.Entity):
+            child = fields.Embedded(entity='MyForwardEmbeddedEntity')
+
+        ensure(MyForwardEmbeddingEntity.validation_spec).is_none()
+
+        class MyForwardEmbeddedEntity(entities.Entity):
+            foo = fields.String()
+
+        parent = MyForwardEmbeddingEntity(child={'foo': 'blah'})
+        ensure(parent.child).is_a(MyForwardEmbeddedEntity)
+        ensure(MyForwardEmbeddingEntity.validation_spec).has_key('child')
+
+    def test_it_should_not_inherit_generated_validation_while_unresolved(self):
+        from nonobvious import entities
+        from nonobvious import fields
+
+        class MyResolvedBaseEntity(entities.Entity):
+            a = fields.Integer()
+
+        class MyUnresolvedSubEntity(MyResolvedBaseEntity):
+            child = fields.Embedded(entity='MyLaterChildEntity')
+
+        class MyLaterChildEntity(entities.Entity):
+            x = fields.Integer()
+
+        ensure(MyUnresolvedSubEntity).called_with(child={'x': 'bad'}, a=1).raises(
+            MyUnresolvedSubEntity.ValidationError)
+        entity = MyUnresolvedSubEntity(child={'x': 1}, a=1)
+        ensure(entity.child).is_a(MyLaterChildEntity)
+        ensure('_validate' in MyUnresolvedSubEntity.__dict__).is_true()
+
+    def test_it_should_pickle_by_registered_name(self):
+        import cPickle as pickle
+        from nonobvious import entities
+        from nonobvious import fields
+
+        class MyPickledChild(entities.CompactEntity):
+            foo = fields.String()
+
+        class MyPickledEntity(entities.Entity):
+            child = fields.Embedded(entity=MyPickledChild)
+            later = fields.Embedded(entity=MyPickledChild, lazy=True)
+            tags = fields.StringList()
+
+        for protocol in [0, 2]:
+            entity = MyPickledEntity(child={'foo': 'a'}, later={'foo': 'b'}, tags=['x'])
+            unpickled = pickle.loads(pickle.dumps(entity, protocol))
+            ensure(unpickled).is_a(MyPickledEntity)
+            ensure(unpickled['later'].materialized).is_false()
+            ensure(unpickled.later.foo).equals('b')
+            ensure(unpickled).equals(entity)
+            ensure(unpickled.child).is_a(MyPickledChild)
+
+    def test_it_should_validate_changed_members_on_copy(self):
+        from nonobvious import entities
+        from nonobvious import fields
+
+        class MyEntity(entities.Entity):
+            foo = fields.String(required=True)
+            bar = fields.Integer(default=2)
+            baz = fields.IntegerList(default=())
+
+        entity = MyEntity(foo='baz')
+        ensure(entity.copy).called_with(bar='3').raises(MyEntity.ValidationError)
+        ensure(entity.copy).called_with({'foo': 1}).raises(MyEntity.ValidationError)
+
+        copied = entity.copy({'bar': 3}, baz=[1, 2], extra='!!!')
+        ensure(copied).is_a(MyEntity)
+        ensure(copied).equals({'foo': 'baz', 'bar': 3, 'baz': [1, 2], 'extra': '!!!'})
+        ensure(copied.baz).is_a(fields.frozenlist)
+        ensure(copied.__setitem__).called_with('foo', 'blah').raises(MyEntity.ConstraintError)
+
+    def test_it_should_only_validate_changed_members_on_copy(self):
+        from mock import patch
+        from nonobvious import entities
+        from nonobvious import fields
+
+        class MyEntity(entities.Entity):
+            foo = fields.String(required=True)
+            bar = fields.Integer(default=2)
+
+        entity = MyEntity(foo='baz')
+        with patch.object(MyEntity.foo, 'get_validator') as get_validator:
+            entity.copy(bar=3)
+        ensure(get_validator.called).is_false()
+
+
+    def test_it_should_build_trusted_data_without_validation(self):
+        from mock import patch
+        from nonobvious import entities
+        from nonobvious import fields
+
+        class MyEntity(entities.Entity):
+            foo = fields.String(required=True)
+            bar = fields.Integer(default=2)
+
+        entity = MyEntity.trusted({'foo': 'baz'}, extra=1)
+        ensure(entity).is_a(MyEntity)
+        ensure(entity).equals({'foo': 'baz', 'bar': 2, 'extra': 1})
+        ensure(MyEntity.trusted(bar='not validated')).equals({'bar': 'not validated'})
+
+        with patch.object(MyEntity, 'trusted_sample_rate', 1.0):
+            ensure(MyEntity.trusted).called_with(bar='not validated').raises(MyEntity.ValidationError)
+
+    def test_it_should_adapt_defaults_for_trusted_data(self):
+        from concon import frozenlist
+        from nonobvious import entities
+        from nonobvious import fields
+
+        class MyListDefaultEntity(entities.Entity):
+            id = fields.Integer()
+            ids = fields.IntegerList(default=())
+            codes = fields.IntegerList(default=[], compact=True)
+
+        trusted = MyListDefaultEntity.trusted(id=1)
+        ensure(trusted.ids).is_a(frozenlist)
+        ensure(trusted.codes).is_a(MyListDefaultEntity.fields['codes'].container)
+        ensure(trusted).equals(MyListDefaultEntity(id=1))
+        ensure(hash(trusted)).equals(hash(MyListDefaultEntity(id=1)))
+
+    def test_it_should_adapt_embedded_defaults_for_trusted_data(self):
+        from nonobvious import entities
+        from nonobvious import fields
+
+        class MyDefaultAddress(entities.Entity):
+            city = fields.String()
+
+        class MyEmbeddedDefaultEntity(entities.Entity):
+            n = fields.Integer()
+            addr = fields.Embedded(entity=MyDefaultAddress, default={'city': 'X'})
+            later = fields.Embedded(entity='MyLaterDefaultAddress', default={'city': 'Y'})
+
+        class MyLaterDefaultAddress(entities.Entity):
+            city = fields.String()
+
+        trusted = MyEmbeddedDefaultEntity.trusted(n=1)
+        ensure(trusted.addr).is_a(MyDefaultAddress)
+        ensure(trusted.addr.city).equals('X')
+        ensure(trusted.later).is_a(MyLaterDefaultAddress)
+        ensure(trusted).equals(MyEmbeddedDefaultEntity(n=1))
+        ensure(list(MyEmbeddedDefaultEntity.bulk([{'n': 1}], trusted=True))[0].addr).is_a(MyDefaultAddress)
+        decoded = MyEmbeddedDefaultEntity.from_primitive({'n': 1}, trusted=True)
+        ensure(decoded.addr).is_a(MyDefaultAddress)
+        ensure(decoded).equals(trusted)
+
+    def test_it_should_intern_equal_instances_when_asked(self):
+        from nonobvious import entities
+        from nonobvious import fields
+
+        class MyInternedEntity(entities.Entity):
+            interned = True
+            code = fields.String(required=True)
+            places = fields.Integer(default=2)
+
+        usd = MyInternedEntity(code='USD')
+        ensure(MyInternedEntity(code='USD')).is_(usd)
+        ensure(MyInternedEntity.trusted(code='USD')).is_(usd)
+        ensure(MyInternedEntity(code='JPY').copy(code='USD')).is_(usd)
+        ensure(list(MyInternedEntity.bulk([{'code': 'USD'}]))[0]).is_(usd)
+        ensure(MyInternedEntity(code='USD', places=3)).is_not(usd)
+
+    def test_it_should_intern_instances_with_list_members(self):
+        from nonobvious import entities
+        from nonobvious import fields
+
+        class MyInternedListEntity(entities.Entity):
+            interned = True
+            codes = fields.StringList(default=())
+
+        pair = MyInternedListEntity(codes=['USD', 'JPY'])
+        ensure(MyInternedListEntity(codes=['USD', 'JPY'])).is_(pair)
+        ensure(MyInternedListEntity(codes=['JPY', 'USD'])).is_not(pair)
+        ensure(MyInternedListEntity()).is_(MyInternedListEntity())
+
+    def test_it_should_reject_members_named_after_class_settings(self):
+        from nonobvious import entities
+        from nonobvious import fields
+
+        def define(name, value):
+            return entities.EntityMeta('MyClashingEntity', (entities.Entity,), {name: value})
+
+        for name in entities.SETTINGS:
+            ensure(define).called_with(name, fields.Boolean()).raises(TypeError)
+            ensure(define).called_with(name, fields.Computed(lambda self: True)).raises(TypeError)
+        ensure(entities.Entity.entities).does_not_contain('MyClashingEntity')
+        ensure(define('interned', True).interned).is_true()
+
+    def test_it_should_only_intern_live_instances_up_to_a_limit(self):
+        import gc
+        from nonobvious import entities
+        from nonobvious import fields
+
+        class MyInternedEntity(entities.Entity):
+            interned = True
+            intern_limit = 1
+            code = fields.String(required=True)
+
+        usd = MyInternedEntity(code='USD')
+        ensure(MyInternedEntity(code='JPY')).is_not(MyInternedEntity(code='JPY'))
+
+        del usd
+        gc.collect()
+        jpy = MyInternedEntity(code='JPY')
+        ensure(MyInternedEntity(code='JPY')).is_(jpy)
+
+    def test_it_should_not_intern_by_default(self):
+        from nonobvious import entities
+        from nonobvious import fields
+
+        class MyEntity(entities.Entity):
+            code = fields.String(required=True)
+
+        ensure(MyEntity(code='USD')).is_not(MyEntity(code='USD'))
+
+    def test_it_should_hash_by_content_once(self):
+        from mock import patch
+        from nonobvious import entities
+        from nonobvious import fields
+
+        class MyEntity(entities.Entity):
+            foo = fields.String()
+            bar = fields.IntegerList(default=())
+
+        class MyParentEntity(entities.Entity):
+            child = fields.Embedded(entity=MyEntity)
+
+        entity1 = MyEntity(foo='baz', bar=[1, 2])
+        entity2 = MyEntity(foo='baz', bar=[1, 2])
+        ensure(hash(entity1)).equals(hash(entity2))
+        ensure(set([entity1, entity2])).has_length(1)
+        ensure(hash(MyParentEntity(child=entity1))).equals(hash(MyParentEntity(child=entity2)))
+
+        with patch.object(entities, 'hash_value') as hash_value:
+            hash(entity1)
+        ensure(hash_value.called).is_false()
+
+    def test_it_should_compare_quickly(self):
+        from nonobvious import entities
+        from nonobvious import fields
+
+        class MyEntity(entities.Entity):
+            foo = fields.String()
+
+        class MyOtherEntity(entities.Entity):
+            foo = fields.String()
+
+        entity = MyEntity(foo='baz')
+        ensure(entity == MyEntity(foo='baz')).is_true()
+        ensure(entity != MyEntity(foo='baz')).is_false()
+        ensure(entity == {'foo': 'baz'}).is_true()
+        ensure(entity == MyOtherEntity(foo='baz')).is_false()
+
+        other = MyEntity(foo='blah')
+        hash(entity), hash(other)
+        ensure(entity == other).is_false()
+        ensure(entity != other).is_true()
+
+class PersistentEntityTests(unittest.TestCase):
+    def setUp(self):
+        from nonobvious import entities
+        from nonobvious import fields
+
+        class MyPersistentEntity(entities.PersistentEntity):
+            foo = fields.String(required=True)
+            bar = fields.Integer(default=2)
+
+        self.MyPersistentEntity = MyPersistentEntity
+
+    def test_it_should_validate(self):
+        MyEntity = self.MyPersistentEntity
+        ensure(MyEntity).called_with().raises(MyEntity.ValidationError)
+        ensure(MyEntity).called_with(foo=1).raises(MyEntity.ValidationError)
+        ensure(MyEntity).called_with(foo='baz').equals({'foo': 'baz', 'bar': 2})
+
+    def test_it_should_be_a_read_only_mapping(self):
+        import collections
+        entity = self.MyPersistentEntity(foo='baz')
+        ensure(entity).is_a(collections.Mapping)
+        ensure(entity.foo).equals('baz')
+        ensure(entity['bar']).equals(2)
+        ensure(dict(entity)).equals({'foo': 'baz', 'bar': 2})
+        ensure(entity.__setitem__).called_with('foo', 'blah').raises(entity.ConstraintError)
+        ensure(setattr).called_with(entity, 'foo', 'blah').raises(entity.ConstraintError)
+
+    def test_it_should_share_structure_between_copies(self):
+        entity1 = self.MyPersistentEntity(foo='baz')
+        entity2 = entity1.copy(bar=3)
+        ensure(entity1).equals({'foo': 'baz', 'bar': 2})
+        ensure(entity2).equals({'foo': 'baz', 'bar': 3})
+        ensure(entity2).is_a(self.MyPersistentEntity)
+        ensure(entity1.copy).called_with(bar='3').raises(entity1.ValidationError)
+
+    def test_it_should_embed_and_be_embedded(self):
+        from nonobvious import entities
+        from nonobvious import fields
+
+        class MyPersistentParent(entities.PersistentEntity):
+            child = fields.Embedded(entity=self.MyPersistentEntity)
+
+        parent = MyPersistentParent(child={'foo': 'baz'})
+        ensure(parent.child).is_a(self.MyPersistentEntity)
+        ensure(parent).equals({'child': {'foo': 'baz', 'bar': 2}})
+
+    def test_it_should_represent_itself_as_a_string(self):
+        entity = self.MyPersistentEntity(foo='baz', bar=2)
+        ensure(repr(entity)).equals("MyPersistentEntity({})".format(
+            {'foo': 'baz', 'bar': 2}))
+
+    def test_it_should_be_hashable(self):
+        entity = self.MyPersistentEntity(foo='baz')
+        ensure(hash(entity)).equals(hash(self.MyPersistentEntity(foo='baz')))
+        ensure(hash(entity)).equals(hash(entity.copy(bar=3).copy(bar=2)))
+
+
+class CompactEntityTests(unittest.TestCase):
+    def setUp(self):
+        from nonobvious import entities
+        from nonobvious import fields
+
+        class MyCompactEntity(entities.CompactEntity):
+            foo = fields.String(required=True)
+            bar = fields.Integer(default=2)
+            baz = fields.String()
+
+        self.MyCompactEntity = MyCompactEntity
+
+    def test_it_should_not_have_a_per_instance_dict(self):
+        from nonobvious import fields
+
+        entity = self.MyCompactEntity(foo='blah')
+        ensure(hasattr(entity, '__dict__')).is_false()
+        ensure(entity._values).equals((2, fields.NIL, 'blah'))
+
+    def test_it_should_validate(self):
+        MyEntity = self.MyCompactEntity
+        ensure(MyEntity).called_with().raises(MyEntity.ValidationError)
+        ensure(MyEntity).called_with(foo=1).raises(MyEntity.ValidationError)
+        ensure(MyEntity).called_with(foo='blah', extra=1).raises(MyEntity.ValidationError)
+
+    def test_it_should_be_a_read_only_mapping(self):
+        entity = self.MyCompactEntity(foo='blah')
+        ensure(entity).equals({'foo': 'blah', 'bar': 2})
+        ensure(entity).has_length(2)
+        ensure(entity.foo).equals('blah')
+        ensure(entity.bar).equals(2)
+        ensure('baz' in entity).is_false()
+        ensure(entity.__getitem__).called_with('baz').raises(KeyError)
+        ensure(entity.get('baz', 'default')).equals('default')
+        ensure(sorted(entity.keys())).equals(['bar', 'foo'])
+        ensure(entity.__setitem__).called_with('foo', 'baz').raises(entity.ConstraintError)
+        ensure(setattr).called_with(entity, 'foo', 'baz').raises(entity.ConstraintError)
+
+    def test_it_should_produce_a_copy(self):
+        entity1 = self.MyCompactEntity(foo='blah')
+        entity2 = entity1.copy(baz='boo')
+        ensure(entity1).equals({'foo': 'blah', 'bar': 2})
+        ensure(entity2).equals({'foo': 'blah', 'bar': 2, 'baz': 'boo'})
+        ensure(entity2.baz).equals('boo')
+        ensure(entity1.copy).called_with(extra=1).raises(entity1.ValidationError)
+        ensure(entity1.copy).called_with(bar='1').raises(entity1.ValidationError)
+
+    def test_it_should_read_fields_by_each_class_layout(self):
+        from nonobvious import fields
+
+        class MyCompactSubEntity(self.MyCompactEntity):
+            c = fields.Integer(default=3)
+
+        entity = MyCompactSubEntity()
+        ensure(entity.c).equals(3)
+        ensure(entity.bar).equals(2)
+        ensure(entity.foo).is_(fields.NIL)
+        ensure(self.MyCompactEntity(foo='blah').bar).equals(2)
+        ensure(self.MyCompactEntity(foo='blah', bar=4).bar).equals(4)
+
+    def test_it_should_read_fields_through_positional_accessors(self):
+        from nonobvious import entities
+        from nonobvious import fields
+
+        class MyCompactChild(entities.CompactEntity):
+            foo = fields.String()
+
+        class MyCompactParent(entities.CompactEntity):
+            bar = fields.Integer(default=2)
+            child = fields.Embedded(entity=MyCompactChild, lazy=True)
+
+        ensure(MyCompactParent.__dict__['bar']).is_a(property)
+        ensure(MyCompactParent.fields['bar']).is_a(fields.Integer)
+        parent = MyCompactParent(child={'foo': 'blah'})
+        ensure(parent['child']).is_a(fields.LazyEntity)
+        ensure(parent.child).is_a(MyCompactChild)
+        ensure(parent.child).is_(parent.child)
+        ensure(parent.child.foo).equals('blah')
+        ensure(setattr).called_with(parent, 'bar', 3).raises(parent.ConstraintError)
+
+        draft = parent.transient()
+        del draft['bar']
+        ensure(draft.freeze().bar).equals(2)
+
+    def test_it_should_intern_when_asked(self):
+        from nonobvious import entities
+        from nonobvious import fields
+
+        class MyInternedCompactEntity(entities.CompactEntity):
+            interned = True
+            code = fields.String(required=True)
+
+        ensure(MyInternedCompactEntity(code='USD')).is_(MyInternedCompactEntity(code='USD'))
+
+
+class SparseEntityTests(unittest.TestCase):
+    def setUp(self):
+        from nonobvious import entities
+        from nonobvious import fields
+
+        class MySparseEntity(entities.SparseEntity):
+            foo = fields.String(required=True)
+            bar = fields.Integer(default=2)
+            baz = fields.String(default='')
+            qux = fields.String()
+
+        class MyEntity(entities.Entity):
+            foo = fields.String(required=True)
+            bar = fields.Integer(default=2)
+            baz = fields.String(default='')
+            qux = fields.String()
+
+        self.MySparseEntity = MySparseEntity
+        self.MyEntity = MyEntity
+
+    def test_it_should_only_store_members_that_differ_from_defaults(self):
+        entity = self.MySparseEntity(foo='blah', baz='')
+        ensure(hasattr(entity, '__dict__')).is_false()
+        ensure(entity._data).equals({'foo': 'blah'})
+        ensure(self.MySparseEntity(foo='blah', bar=3)._data).equals({'foo': 'blah', 'bar': 3})
+
+    def test_it_should_be_a_read_only_mapping_including_defaults(self):
+        entity = self.MySparseEntity(foo='blah')
+        ensure(entity).equals({'foo': 'blah', 'bar': 2, 'baz': ''})
+        ensure(entity).has_length(3)
+        ensure(sorted(entity.keys())).equals(['bar', 'baz', 'foo'])
+        ensure(sorted(entity.items())).equals([('bar', 2), ('baz', ''), ('foo', 'blah')])
+        ensure(entity.bar).equals(2)
+        ensure(entity['bar']).equals(2)
+        ensure('bar' in entity).is_true()
+        ensure('qux' in entity).is_false()
+        ensure(entity.__getitem__).called_with('qux').raises(KeyError)
+        ensure(entity.get('qux', 'default')).equals('default')
+        ensure(entity.__setitem__).called_with('foo', 'baz').raises(entity.ConstraintError)
+
+    def test_it_should_compare_like_a_regular_entity(self):
+        entity = self.MySparseEntity(foo='blah', extra=1)
+        regular = self.MyEntity(foo='blah', extra=1)
+        ensure(entity).equals(dict(regular))
+        ensure(dict(entity)).equals(regular)
+        ensure(len(entity)).equals(len(regular))
+        ensure(entity).equals(self.MySparseEntity(foo='blah', bar=2, extra=1))
+        ensure(hash(entity)).equals(hash(self.MySparseEntity(foo='blah', bar=2, extra=1)))
+
+    def test_it_should_produce_sparse_copies(self):
+        entity1 = self.MySparseEntity(foo='blah', bar=3)
+        entity2 = entity1.copy(bar=2, qux='boo')
+        ensure(entity2._data).equals({'foo': 'blah', 'qux': 'boo'})
+        ensure(entity2).equals({'foo': 'blah', 'bar': 2, 'baz': '', 'qux': 'boo'})
+        ensure(entity1).equals({'foo': 'blah', 'bar': 3, 'baz': ''})
+        ensure(entity1.copy).called_with(bar='1').raises(entity1.ValidationError)
+
+    def test_it_should_keep_defaulted_members_that_were_removed_absent(self):
+        entity = self.MySparseEntity(foo='blah').patch({'bar': ['-']})
+        ensure('bar' in entity).is_false()
+        ensure(entity).has_length(2)
+        ensure(entity).equals({'foo': 'blah', 'baz': ''})
+        ensure(entity.bar).equals(2)
+
+    def test_it_should_not_store_list_defaults(self):
+        from nonobvious import entities
+        from nonobvious import fields
+
+        class MySparseListEntity(entities.SparseEntity):
+            tags = fields.StringList(default=())
+            ids = fields.IntegerList(default=(), compact=True)
+
+        entity = MySparseListEntity()
+        ensure(entity._data).equals({})
+        ensure(entity).equals({'tags': [], 'ids': []})
+        ensure(MySparseListEntity(tags=['a'])._data).equals({'tags': ['a']})
+
+
+class NestedUpdateTests(unittest.TestCase):
+    def setUp(self):
+        from nonobvious import entities
+        from nonobvious import fields
+
+        class MyNestedAddress(entities.Entity):
+            city = fields.String()
+            zip = fields.Integer()
+
+        class MyNestedCustomer(entities.CompactEntity):
+            name = fields.String(required=True)
+            address = fields.Embedded(entity=MyNestedAddress)
+            visits = fields.Integer(default=0)
+
+        class MyNestedOrder(entities.Entity):
+            customer = fields.Embedded(entity=MyNestedCustomer)
+            billing = fields.Embedded(entity=MyNestedAddress, lazy=True)
+            lines = fields.StringList(default=())
+
+        self.MyNestedOrder = MyNestedOrder
+        self.order = MyNestedOrder(
+            customer={'name': 'Bob', 'address': {'city': 'Chicago', 'zip': 60601}},
+            billing={'city': 'Boston', 'zip': 2101},
+            lines=['a', 'b'],
+        )
+
+    def test_it_should_set_nested_members(self):
+        order = self.order
+        updated = order.set_in(['customer', 'address', 'city'], 'Evanston')
+        ensure(updated.customer.address.city).equals('Evanston')
+        ensure(updated.customer.address.zip).equals(60601)
+        ensure(updated).is_a(self.MyNestedOrder)
+        ensure(order.customer.address.city).equals('Chicago')
+
+        updated = order.set_in(('billing', 'zip'), 2102)
+        ensure(updated.billing).equals({'city': 'Boston', 'zip': 2102})
+        ensure(order.set_in('lines', ['c']).lines).equals(['c'])
+
+    def test_it_should_share_untouched_members(self):
+        order = self.order
+        updated = order.set_in(['customer', 'address', 'city'], 'Evanston')
+        ensure(updated.lines).is_(order.lines)
+        ensure(updated['billing']).is_(order['billing'])
+        ensure(updated.customer.name).is_(order.customer.name)
+
+        updated = order.set_in(['customer', 'visits'], 1)
+        ensure(updated.customer.address).is_(order.customer.address)
+
+    def test_it_should_return_itself_when_nothing_changes(self):
+        order = self.order
+        ensure(order.set_in(['customer', 'address', 'city'], 'Chicago')).is_(order)
+        ensure(order.set_in(['customer', 'visits'], 0)).is_(order)
+        ensure(order.set_in(['billing', 'zip'], 2101)).is_(order)
+        ensure(order.update_in(['customer', 'name'], lambda name: name)).is_(order)
+        ensure(order.set_in).called_with(['customer', 'visits'], 0.0).raises(order.ValidationError)
+
+    def test_it_should_update_nested_members(self):
+        order = self.order
+        updated = order.update_in(['customer', 'visits'], lambda visits, step: visits + step, 2)
+        ensure(updated.customer.visits).equals(2)
+        ensure(order.update_in).called_with(['customer', 'address', 'missing'], len).raises(KeyError)
+
+    def test_it_should_validate_the_new_value_in_context(self):
+        order = self.order
+        with ensure().raises(order.ValidationError) as raised:
+            order.set_in(['customer', 'address', 'zip'], 'sixty')
+        ensure(raised.exception.context).equals(['zip', 'address', 'customer'])
+
+    def test_it_should_reject_bad_paths(self):
+        order = self.order
+        ensure(order.set_in).called_with([], 1).raises(ValueError)
+        ensure(order.set_in).called_with(['lines', 'x'], 1).raises(TypeError)
+        ensure(order.set_in).called_with(['missing', 'x'], 1).raises(KeyError)
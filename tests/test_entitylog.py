@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""tests for the append-only entity log
+"""
+import os
+import shutil
+import tempfile
+import unittest
+
+from ensure import ensure
+
+
+class EntityLogTests(unittest.TestCase):
+    def setUp(self):
+        from nonobvious import entities
+        from nonobvious import fields
+
+        class MyLoggedEntity(entities.Entity):
+            id = fields.Integer(required=True)
+            name = fields.String()
+            color = fields.String()
+
+        self.MyLoggedEntity = MyLoggedEntity
+        self.path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def open(self, **kwargs):
+        from nonobvious.entitylog import EntityLog
+        kwargs.setdefault('indexes', ['color'])
+        return EntityLog(self.path, self.MyLoggedEntity, **kwargs)
+
+    def segments(self):
+        return sorted(name for name in os.listdir(self.path) if name.endswith('.log'))
+
+    def test_it_should_keep_the_latest_version_of_each_entity(self):
+        Entity = self.MyLoggedEntity
+        with self.open() as log:
+            log.append(Entity(id=1, name='one', color='red'))
+            log.append(Entity(id=2, name='two', color='red'))
+            log.append(Entity(id=1, name='uno', color='blue'))
+            ensure(log[1]).equals(Entity(id=1, name='uno', color='blue'))
+            ensure(len(log)).equals(2)
+            ensure(log.find('color', 'red')).equals([Entity(id=2, name='two', color='red')])
+            log.delete(2)
+            ensure(log.get(2)).is_none()
+            ensure(log.find('color', 'red')).equals([])
+            ensure(log.delete).called_with(2).raises(KeyError)
+
+        with self.open() as log:
+            ensure(sorted(log)).equals([1])
+            ensure(log[1].name).equals('uno')
+            ensure(log.find('color', 'blue')).equals([log[1]])
+
+    def test_it_should_bulk_load_across_segments(self):
+        with self.open(segment_size=256) as log:
+            loader = log.load(
+                ({'id': n, 'name': 'n%d' % n} for n in range(50)),
+                collect_errors=True
+            )
+            ensure(loader.loaded).equals(50)
+            ensure(len(self.segments())).is_greater_than(1)
+            ensure(log[49].name).equals('n49')
+            ensure(log[0].name).equals('n0')
+
+        with self.open(segment_size=256) as log:
+            ensure(len(log)).equals(50)
+            ensure(dict(log.iteritems())[25].name).equals('n25')
+
+    def test_it_should_cut_off_a_torn_write_at_the_tail(self):
+        Entity = self.MyLoggedEntity
+        with self.open() as log:
+            log.extend([Entity(id=1), Entity(id=2)])
+        path = os.path.join(self.path, self.segments()[-1])
+        size = os.path.getsize(path)
+        with open(path, 'r+b') as stream:
+            stream.truncate(size - 3)
+
+        with self.open() as log:
+            ensure(sorted(log)).equals([1])
+            log.append(Entity(id=3))
+        with self.open() as log:
+            ensure(sorted(log)).equals([1, 3])
+
+    def test_it_should_refuse_corruption_before_the_tail(self):
+        from nonobvious.entitylog import LogCorruptedError
+        Entity = self.MyLoggedEntity
+        with self.open(segment_size=64) as log:
+            log.extend(Entity(id=n) for n in range(10))
+        path = os.path.join(self.path, self.segments()[0])
+        with open(path, 'r+b') as stream:
+            stream.seek(12)
+            stream.write('X')
+
+        ensure(self.open).called_with(segment_size=64).raises(LogCorruptedError)
+
+    def test_it_should_compact_to_live_records(self):
+        Entity = self.MyLoggedEntity
+        with self.open(segment_size=128) as log:
+            for version in range(5):
+                log.extend(Entity(id=n, name='v%d' % version, color='red') for n in range(10))
+            log.delete(0)
+            before = sum(os.path.getsize(os.path.join(self.path, name)) for name in self.segments())
+            log.compact()
+            after = sum(os.path.getsize(os.path.join(self.path, name)) for name in self.segments())
+            ensure(after).is_less_than(before / 4)
+            ensure(log[9].name).equals('v4')
+            ensure(len(log.find('color', 'red'))).equals(9)
+            log.append(Entity(id=10))
+
+        with self.open(segment_size=128) as log:
+            ensure(sorted(log)).equals(range(1, 11))
+            ensure(log[5].name).equals('v4')
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""tests for entity frames
+"""
+import datetime as dt
+import unittest
+
+from ensure import ensure
+
+
+class EntityFrameTests(unittest.TestCase):
+    def setUp(self):
+        from nonobvious import entities
+        from nonobvious import fields
+
+        class MyFramedEntity(entities.Entity):
+            name = fields.String(required=True)
+            status = fields.String(choices=('open', 'closed'), default='open')
+            amount = fields.Integer(default=0)
+            paid = fields.Boolean(default=False)
+            due = fields.Date()
+            created = fields.DateTime()
+            tags = fields.StringList(default=())
+
+        self.MyFramedEntity = MyFramedEntity
+        from pytz import timezone
+        self.created = timezone('US/Central').localize(dt.datetime(2014, 6, 1, 12, 30))
+        self.rows = [
+            {'name': 'a', 'amount': 5, 'due': dt.date(2014, 6, 2), 'created': self.created},
+            {'name': 'b', 'status': 'closed', 'paid': True, 'due': dt.date(2014, 6, 3),
+             'created': self.created, 'tags': ['x']},
+            {'name': 'c', 'amount': 7, 'due': dt.date(2014, 6, 4), 'created': self.created},
+        ]
+
+    def make_frame(self, **kwargs):
+        from nonobvious.frames import EntityFrame
+        return EntityFrame(self.MyFramedEntity, self.rows, **kwargs)
+
+    def test_it_should_store_typed_columns(self):
+        frame = self.make_frame()
+        ensure(frame).has_length(3)
+        ensure(str(frame['amount'].dtype)).equals('int64')
+        ensure(str(frame['paid'].dtype)).equals('bool')
+        ensure(str(frame['due'].dtype)).equals('datetime64[D]')
+        ensure(str(frame['created'].dtype)).equals('datetime64[us]')
+        ensure(str(frame['name'].dtype)).equals('object')
+        ensure(frame['amount'].sum()).equals(12)
+
+    def test_it_should_store_categorical_columns(self):
+        frame = self.make_frame(categorical=['status'])
+        ensure(str(frame.columns['status'].data.dtype)).equals('int32')
+        ensure(list(frame['status'])).equals(['open', 'closed', 'open'])
+
+    def test_it_should_materialize_rows_as_entities(self):
+        frame = self.make_frame(categorical=['status'])
+        expected = [self.MyFramedEntity(row) for row in self.rows]
+
+        ensure(frame[1]).is_a(self.MyFramedEntity)
+        ensure(frame[1]).equals(expected[1])
+        ensure(frame[-1]).equals(expected[-1])
+        ensure(frame[0].created).equals(self.created)
+        ensure(frame.row).called_with(3).raises(IndexError)
+        ensure(list(frame)).equals(expected)
+
+    def test_it_should_select_rows_by_mask(self):
+        frame = self.make_frame()
+        selected = frame[frame['amount'] > 4]
+        ensure(selected).has_length(2)
+        ensure([entity.name for entity in selected]).equals(['a', 'c'])
+        ensure(list(frame[1:]['name'])).equals(['b', 'c'])
+
+    def test_it_should_validate_columns(self):
+        from nonobvious.frames import EntityFrame
+        MyFramedEntity = self.MyFramedEntity
+        bad_rows = [
+            [{'name': 'a'}, {'amount': 1}],
+            [{'name': 'a'}, {'name': 'b', 'amount': '1'}],
+            [{'name': 'a'}, {'name': 'b', 'status': 'pending'}],
+            [{'name': 'a', 'paid': 1}],
+            [{'name': 'a', 'created': dt.datetime.now()}],
+            [{'name': 'a', 'tags': [1]}],
+            [{'name': 'a', 'extra': 1}],
+        ]
+        for rows in bad_rows:
+            ensure(EntityFrame).called_with(MyFramedEntity, rows).raises(MyFramedEntity.ValidationError)
+
+    def test_it_should_fall_back_to_object_columns(self):
+        from nonobvious.frames import EntityFrame
+        frame = EntityFrame(self.MyFramedEntity, [{'name': 'a', 'amount': 2 ** 70}, {'name': 'b'}])
+        ensure(str(frame['amount'].dtype)).equals('object')
+        ensure(str(frame['due'].dtype)).equals('object')
+        ensure(frame[0].amount).equals(2 ** 70)
+        ensure('due' in frame[0]).is_false()
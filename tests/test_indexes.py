@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+"""tests for indexed entity collections
+"""
+import datetime as dt
+import unittest
+
+from ensure import ensure
+
+
+class IndexedCollectionTests(unittest.TestCase):
+    def setUp(self):
+        from nonobvious import entities
+        from nonobvious import fields
+        from nonobvious.indexes import IndexedCollection
+
+        class MyIndexedEntity(entities.Entity):
+            id = fields.Integer(required=True)
+            color = fields.String()
+            size = fields.Integer()
+            born = fields.Date()
+
+        self.MyIndexedEntity = MyIndexedEntity
+        self.entities = [
+            MyIndexedEntity(id=n, color=['red', 'blue'][n % 2], size=n % 5,
+                            born=dt.date(2014, 1, 1) + dt.timedelta(days=n))
+            for n in range(20)
+        ]
+        self.collection = IndexedCollection(
+            MyIndexedEntity, self.entities, hashed=['color'], ordered=['size', 'born'])
+
+    def ids(self, entities):
+        return sorted(entity.id for entity in entities)
+
+    def test_it_should_find_by_field_value(self):
+        collection = self.collection
+        ensure(len(collection)).equals(20)
+        ensure(collection[3]).is_(self.entities[3])
+        ensure(self.ids(collection.find('color', 'red'))).equals(range(0, 20, 2))
+        ensure(self.ids(collection.find('size', 4))).equals([4, 9, 14, 19])
+        ensure(collection.find('color', 'green')).equals([])
+        ensure(collection.find_one('color', 'green')).is_none()
+        ensure(collection.find_one('color', 'blue').color).equals('blue')
+
+    def test_it_should_find_ranges_in_order(self):
+        collection = self.collection
+        found = collection.range('size', 1, 2)
+        ensure([entity.size for entity in found]).equals([1] * 4 + [2] * 4)
+        ensure(self.ids(collection.range('born', high=dt.date(2014, 1, 3)))).equals([0, 1, 2])
+        ensure(self.ids(collection.range('born', low=dt.date(2014, 1, 19)))).equals([18, 19])
+
+    def test_it_should_update_indexes_for_replaced_entities(self):
+        collection = self.collection
+        collection.add(collection[4].copy(color='green', size=0))
+        ensure(self.ids(collection.find('color', 'green'))).equals([4])
+        ensure(self.ids(collection.find('color', 'red'))).equals([0, 2, 6, 8, 10, 12, 14, 16, 18])
+        ensure(self.ids(collection.find('size', 4))).equals([9, 14, 19])
+        ensure(self.ids(collection.find('size', 0))).equals([0, 4, 5, 10, 15])
+        ensure(len(collection)).equals(20)
+
+        collection.remove(4)
+        ensure(collection.find('color', 'green')).equals([])
+        ensure(self.ids(collection.range('size', 0, 0))).equals([0, 5, 10, 15])
+        ensure(4 in collection).is_false()
+        ensure(collection.remove).called_with(4).raises(KeyError)
+
+    def test_it_should_only_sort_ordered_fields(self):
+        from nonobvious.indexes import IndexedCollection
+        ensure(IndexedCollection).called_with(self.MyIndexedEntity, ordered=['color']).raises(TypeError)
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+"""tests for the package namespace
+"""
+import os
+import subprocess
+import sys
+import unittest
+
+from ensure import ensure
+
+
+def run_python(source):
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    return subprocess.check_output([sys.executable, '-c', source], cwd=root).split()
+
+
+class PackageTests(unittest.TestCase):
+    def test_it_should_import_exported_names_lazily(self):
+        ensure(run_python(
+            'import sys, nonobvious\n'
+            'print "nonobvious.entities" in sys.modules, "valideer" in sys.modules\n'
+            'nonobvious.Entity\n'
+            'print "nonobvious.entities" in sys.modules\n'
+        )).equals(['False', 'False', 'True'])
+
+    def test_it_should_export_everything_with_star_imports(self):
+        import nonobvious
+        from nonobvious import entities, fields
+        namespace = {}
+        exec 'from nonobvious import *' in namespace
+        ensure(namespace['Entity']).is_(entities.Entity)
+        ensure(namespace['Embedded']).is_(fields.Embedded)
+        ensure(namespace['get_validator']).is_(nonobvious.V.parse)
+        ensure(namespace['fields']).is_(fields)
+        ensure(set(nonobvious.__all__) - set(namespace)).equals(set())
+        ensure(getattr).called_with(nonobvious, 'nothing_here').raises(AttributeError)
+
+    def test_it_should_export_every_public_entity_and_field_name(self):
+        import nonobvious
+        from nonobvious import entities, fields
+        ensure(set(entities.__all__) | set(fields.__all__) <= set(nonobvious.__all__)).is_true()
+        for name in entities.__all__:
+            ensure(getattr(nonobvious, name)).is_(getattr(entities, name))
+        for name in fields.__all__:
+            ensure(getattr(nonobvious, name)).is_(getattr(fields, name))
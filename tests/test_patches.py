@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""tests for entity diffs and patches
+"""
+import datetime as dt
+import json
+import unittest
+
+from ensure import ensure
+
+
+class PatchTests(unittest.TestCase):
+    def setUp(self):
+        from nonobvious import entities
+        from nonobvious import fields
+
+        class MyPatchedAddress(entities.Entity):
+            city = fields.String()
+            zip = fields.Integer()
+
+        class MyPatchedCustomer(entities.CompactEntity):
+            name = fields.String(required=True)
+            address = fields.Embedded(entity=MyPatchedAddress)
+            tags = fields.StringList(default=())
+            born = fields.Date()
+
+        self.MyPatchedCustomer = MyPatchedCustomer
+        self.old = MyPatchedCustomer(
+            name='Bob',
+            address={'city': 'Chicago', 'zip': 60601},
+            tags=['a', 'b', 'c', 'd'],
+            born=dt.date(1970, 1, 2),
+        )
+        self.new = self.old.copy(
+            address={'city': 'Chicago', 'zip': 60602},
+            tags=['a', 'b', 'x', 'd', 'e'],
+            born=dt.date(1970, 1, 3),
+        )
+
+    def test_it_should_diff_only_what_changed(self):
+        ensure(self.old.diff(self.new)).equals({
+            'address': ['~', {'zip': ['=', 60602]}],
+            'tags': ['*', 2, 4, ['x', 'd', 'e']],
+            'born': ['=', '1970-01-03'],
+        })
+        ensure(self.old.diff(self.old)).equals({})
+        appended = self.old.copy(tags=list(self.old.tags) + ['e'])
+        ensure(self.old.diff(appended)).equals({'tags': ['*', 4, 4, ['e']]})
+
+    def test_it_should_patch_to_the_new_version(self):
+        changes = json.loads(json.dumps(self.old.diff(self.new)))
+        patched = self.old.patch(changes)
+        ensure(patched).is_a(self.MyPatchedCustomer)
+        ensure(patched).equals(self.new)
+        ensure(patched.tags).is_a(type(self.new.tags))
+        ensure(patched.address).equals(self.new.address)
+
+        removed = self.old.patch({'born': ['-']})
+        ensure(removed).equals(dict((k, v) for k, v in self.old.iteritems() if k != 'born'))
+        ensure('born' in removed).is_false()
+
+    def test_it_should_validate_touched_members(self):
+        from nonobvious import patches
+        ValidationError = self.MyPatchedCustomer.ValidationError
+        for changes in [
+                {'name': ['-']},
+                {'born': ['=', '1970/01/03']},
+                {'tags': ['*', 0, 0, [1]]},
+                {'tags': ['*', 3, 9, []]},
+                {'address': ['~', {'zip': ['=', 'x']}]},
+                {'name': ['?']},
+        ]:
+            ensure(self.old.patch).called_with(changes).raises(ValidationError)
+        ensure(patches.diff).called_with(self.old, self.old.address).raises(TypeError)
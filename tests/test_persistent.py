@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""tests for persistent data structures
+"""
+import unittest
+
+from ensure import ensure
+
+
+class Collider(object):
+    """A key whose hash always collides with its siblings'.
+    """
+    def __init__(self, name):
+        self.name = name
+
+    def __hash__(self):
+        return 42
+
+    def __eq__(self, other):
+        return isinstance(other, Collider) and other.name == self.name
+
+
+class PersistentMapTests(unittest.TestCase):
+    def test_it_should_be_a_mapping(self):
+        from nonobvious.persistent import PersistentMap
+
+        pmap = PersistentMap({'foo': 1}, bar=2)
+        ensure(pmap).equals({'foo': 1, 'bar': 2})
+        ensure(pmap).has_length(2)
+        ensure(pmap['foo']).equals(1)
+        ensure(pmap.get('baz')).is_none()
+        ensure(pmap.__getitem__).called_with('baz').raises(KeyError)
+        ensure('bar' in pmap).is_true()
+
+    def test_it_should_set_without_modifying_the_original(self):
+        from nonobvious.persistent import PersistentMap
+
+        pmap1 = PersistentMap(foo=1)
+        pmap2 = pmap1.set('bar', 2).set('foo', 3)
+        ensure(pmap1).equals({'foo': 1})
+        ensure(pmap2).equals({'foo': 3, 'bar': 2})
+        ensure(pmap2.set('foo', 3)).is_(pmap2)
+
+    def test_it_should_delete_without_modifying_the_original(self):
+        from nonobvious.persistent import PersistentMap
+
+        pmap1 = PersistentMap(foo=1, bar=2)
+        pmap2 = pmap1.delete('foo')
+        ensure(pmap1).equals({'foo': 1, 'bar': 2})
+        ensure(pmap2).equals({'bar': 2})
+        ensure(pmap2.delete).called_with('foo').raises(KeyError)
+        ensure(pmap2.delete('bar')).equals({})
+
+    def test_it_should_hold_many_keys(self):
+        from nonobvious.persistent import PersistentMap
+
+        data = dict((n, str(n)) for n in range(5000))
+        pmap = PersistentMap(data)
+        ensure(pmap).equals(data)
+        for n in range(0, 5000, 2):
+            pmap = pmap.delete(n)
+            del data[n]
+        ensure(pmap).equals(data)
+        ensure(pmap).has_length(2500)
+
+    def test_it_should_handle_hash_collisions(self):
+        from nonobvious.persistent import PersistentMap
+
+        foo, bar, baz = Collider('foo'), Collider('bar'), Collider('baz')
+        pmap = PersistentMap().set(foo, 1).set(bar, 2).set(baz, 3).set(0, 4)
+        ensure(pmap).has_length(4)
+        ensure(pmap[bar]).equals(2)
+        ensure(pmap.delete(bar).delete(foo)).equals({baz: 3, 0: 4})
+
+    def test_it_should_merge(self):
+        from nonobvious.persistent import PersistentMap
+
+        pmap = PersistentMap(foo=1, bar=2)
+        ensure(pmap.merge({'bar': 3}, baz=4)).equals({'foo': 1, 'bar': 3, 'baz': 4})
+        ensure(pmap.merge()).is_(pmap)
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+"""tests for primitive conversion
+"""
+import datetime as dt
+import unittest
+
+from ensure import ensure
+
+
+class PrimitiveTests(unittest.TestCase):
+    def setUp(self):
+        from pytz import timezone
+        from nonobvious import entities
+        from nonobvious import fields
+
+        class MyAddress(entities.Entity):
+            city = fields.String()
+
+        class MyCustomer(entities.CompactEntity):
+            name = fields.String(required=True)
+            address = fields.Embedded(entity=MyAddress)
+            ids = fields.IntegerList(default=())
+            tags = fields.StringList(default=())
+            active = fields.Boolean(default=True)
+            born = fields.Date()
+            seen = fields.DateTime()
+            opens = fields.Time()
+            extra = fields.Field()
+
+        self.MyAddress = MyAddress
+        self.MyCustomer = MyCustomer
+        self.seen = timezone('US/Central').localize(dt.datetime(2014, 6, 1, 12, 30, 15, 120))
+        self.opens = dt.time(9, 30, tzinfo=timezone('UTC'))
+        self.customer = MyCustomer(
+            name='Bob',
+            address={'city': 'Chicago'},
+            ids=[1, 2],
+            tags=['a'],
+            born=dt.date(1970, 1, 2),
+            seen=self.seen,
+            opens=self.opens,
+            extra={'nested': [1, {'deep': True}]},
+        )
+        self.primitive = {
+            'name': 'Bob',
+            'address': {'city': 'Chicago'},
+            'ids': [1, 2],
+            'tags': ['a'],
+            'active': True,
+            'born': '1970-01-02',
+            'seen': '2014-06-01T12:30:15.000120-05:00',
+            'opens': '09:30:00+00:00',
+            'extra': {'nested': [1, {'deep': True}]},
+        }
+
+    def test_it_should_convert_to_primitives(self):
+        primitive = self.customer.to_primitive()
+        ensure(primitive).equals(self.primitive)
+        ensure(type(primitive)).is_(dict)
+        ensure(type(primitive['address'])).is_(dict)
+        ensure(type(primitive['ids'])).is_(list)
+
+    def test_it_should_convert_from_primitives(self):
+        for trusted in (False, True):
+            customer = self.MyCustomer.from_primitive(self.primitive, trusted=trusted)
+            ensure(customer).is_a(self.MyCustomer)
+            ensure(customer.address).is_a(self.MyAddress)
+            ensure(customer.ids).equals([1, 2])
+            ensure(customer.ids.append).called_with(3).raises(self.MyCustomer.ConstraintError)
+            ensure(customer.seen).equals(self.seen)
+            ensure(customer.seen.utcoffset()).equals(self.seen.utcoffset())
+            ensure(customer.opens.utcoffset()).equals(dt.timedelta(0))
+            ensure(customer).equals(self.customer)
+
+    def test_it_should_validate_primitives(self):
+        MyCustomer = self.MyCustomer
+        for key, value in [('born', '1970/01/02'), ('seen', '2014-06-01T12:30:15'),
+                           ('address', {'city': 5}), ('ids', ['1'])]:
+            primitive = dict(self.primitive)
+            primitive[key] = value
+            ensure(MyCustomer.from_primitive).called_with(primitive).raises(MyCustomer.ValidationError)
+
+    def test_it_should_decode_lazy_embedded_entities_on_demand(self):
+        from nonobvious import entities
+        from nonobvious import fields
+
+        class MyLazyCustomer(entities.Entity):
+            address = fields.Embedded(entity=self.MyAddress, lazy=True)
+
+        customer = MyLazyCustomer.from_primitive({'address': {'city': 5}})
+        ensure(customer['address']).is_a(fields.LazyEntity)
+        ensure(customer.validate).called_with().raises(MyLazyCustomer.ValidationError)
+
+        customer = MyLazyCustomer.from_primitive({'address': {'city': 'Chicago'}})
+        ensure(customer.to_primitive()).equals({'address': {'city': 'Chicago'}})
+        ensure(customer.address).equals(self.MyAddress(city='Chicago'))
+
+    def test_it_should_round_trip_through_json_and_msgpack(self):
+        codec = self.MyCustomer.get_codec()
+        ensure(codec.from_json(codec.to_json(self.customer))).equals(self.customer)
+        ensure(codec.from_msgpack(codec.to_msgpack(self.customer))).equals(self.customer)
+        ensure(self.MyCustomer.get_codec()).is_(codec)
+
+
+class ConversionTests(unittest.TestCase):
+    def test_it_should_convert_untyped_values_by_type(self):
+        from concon import frozendict, frozenlist
+        from nonobvious import primitives
+
+        ensure(primitives.to_primitive(frozendict(a=frozenlist([dt.date(2014, 1, 1)])))).equals(
+            {'a': ['2014-01-01']})
+        ensure(primitives.from_primitive({'a': [1]})).is_a(frozendict)
+        ensure(primitives.from_primitive({'a': [1]})['a']).is_a(frozenlist)
+
+
+class ParseTests(unittest.TestCase):
+    def test_it_should_parse_iso_datetimes(self):
+        from nonobvious import primitives
+        parsed = primitives.parse_datetime('2014-06-01T12:30:15Z')
+        ensure(parsed).equals(dt.datetime(2014, 6, 1, 12, 30, 15, tzinfo=primitives.FixedOffset(0)))
+        ensure(primitives.parse_datetime('2014-06-01T12:30:15.5').microsecond).equals(500000)
+        ensure(primitives.parse_datetime('2014-06-01 12:30:15').tzinfo).is_none()
+        ensure(primitives.parse_datetime).called_with('2014-06-01').raises(ValueError)
+        ensure(primitives.parse_date).called_with('20140601').raises(ValueError)
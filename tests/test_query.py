@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+"""tests for entity queries
+"""
+import unittest
+
+from ensure import ensure
+
+
+class QueryTests(unittest.TestCase):
+    def setUp(self):
+        from nonobvious import entities
+        from nonobvious import fields
+        from nonobvious.indexes import IndexedCollection
+
+        class MyQueriedEntity(entities.Entity):
+            id = fields.Integer(required=True)
+            color = fields.String()
+            size = fields.Integer()
+
+        self.MyQueriedEntity = MyQueriedEntity
+        self.entities = [
+            MyQueriedEntity(id=n, color=['red', 'blue', 'green'][n % 3], size=n % 7)
+            for n in range(40)
+        ] + [MyQueriedEntity(id=40)]
+        self.collection = IndexedCollection(
+            MyQueriedEntity, self.entities, hashed=['color'], ordered=['size'])
+
+    def ids(self, query):
+        return sorted(entity.id for entity in query)
+
+    def expected(self, predicate):
+        return sorted(entity.id for entity in self.entities if predicate(entity))
+
+    def test_it_should_filter_with_conditions(self):
+        from nonobvious.query import Query
+        for source in (self.entities, self.collection):
+            query = Query(source)
+            ensure(self.ids(query.where(color='red'))).equals(
+                self.expected(lambda e: e.color == 'red'))
+            ensure(self.ids(query.where(color='red', size__gt=3))).equals(
+                self.expected(lambda e: e.color == 'red' and e.size > 3))
+            ensure(self.ids(query.where(size__lte=1))).equals(
+                self.expected(lambda e: e.size is not None and e.size <= 1))
+            ensure(self.ids(query.where(color__in=['red', 'blue'], size__ne=0))).equals(
+                self.expected(lambda e: e.color in ('red', 'blue') and e.size != 0))
+            ensure(self.ids(query.where(color__ne='red'))).equals(
+                self.expected(lambda e: e.color != 'red'))
+            ensure(self.ids(query.where(lambda e: e.id % 10 == 0, size__gte=0))).equals(
+                [0, 10, 20, 30])
+        ensure(Query(self.entities).where).called_with(size__between=1).raises(ValueError)
+
+    def test_it_should_order_limit_and_group(self):
+        from nonobvious.query import Query
+        query = Query(self.collection).where(size__gte=5).order_by('-size', 'id')
+        ensure([(e.size, e.id) for e in query.limit(3)]).equals([(6, 6), (6, 13), (6, 20)])
+        ensure(query.first().id).equals(6)
+        ensure(query.count()).equals(10)
+        ensure(query.where(size=9).first()).is_none()
+        ensure(query.limit(0).first()).is_none()
+        ensure(query.limit(0).first('default')).equals('default')
+        groups = query.group_by('size')
+        ensure(sorted(groups)).equals([5, 6])
+        ensure([e.id for e in groups[5]]).equals([5, 12, 19, 26, 33])
+
+    def test_it_should_compile_its_predicate_once(self):
+        from mock import patch
+        from nonobvious import query as query_module
+
+        query = query_module.Query(self.entities).where(color='red')
+        with patch.object(query_module, 'compile_predicate',
+                          wraps=query_module.compile_predicate) as compile_predicate:
+            query.count()
+            query.first()
+            list(query)
+            ordered = query.order_by('id')
+            ordered.all()
+            ensure(compile_predicate.call_count).equals(1)
+            ensure(ordered.predicate).is_(query.predicate)
+            ensure(query.where(size=1).predicate).is_not(query.predicate)
+            ensure(compile_predicate.call_count).equals(2)
+        ensure(query_module.Query(self.entities).predicate).is_none()
+
+    def test_it_should_evaluate_lazily(self):
+        from nonobvious.query import Query
+        seen = []
+
+        def source():
+            for entity in self.entities:
+                seen.append(entity.id)
+                yield entity
+
+        results = iter(Query(source()).where(color='blue'))
+        ensure(seen).equals([])
+        ensure(next(results).id).equals(1)
+        ensure(seen).equals([0, 1])
+
+    def test_it_should_allow_updating_the_collection_while_iterating(self):
+        from nonobvious.query import Query
+        red = self.expected(lambda e: e.color == 'red')
+        for entity in Query(self.collection).where(color='red'):
+            self.collection.add(entity.copy(color='green'))
+        for entity in Query(self.collection).where(size=0):
+            self.collection.add(self.MyQueriedEntity(id=entity.id + 100))
+        ensure(self.collection.find('color', 'red')).equals([])
+        ensure(sorted(e.id for e in self.collection.find('color', 'green'))).contains(red[0])
+        ensure(100 in self.collection).is_true()
@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+"""tests for binary entity records
+"""
+import datetime as dt
+import mmap
+import tempfile
+import unittest
+
+from ensure import ensure
+
+
+class RecordFormatTests(unittest.TestCase):
+    def setUp(self):
+        from pytz import timezone
+        from nonobvious import entities
+        from nonobvious import fields
+        from nonobvious.records import RecordFormat
+
+        class MyRecordEntity(entities.Entity):
+            name = fields.String(required=True)
+            amount = fields.Integer(default=0)
+            paid = fields.Boolean(default=False)
+            due = fields.Date()
+            created = fields.DateTime()
+            seen = fields.DateTime(naive_ok=True)
+
+        self.MyRecordEntity = MyRecordEntity
+        self.format = RecordFormat(MyRecordEntity, string_sizes={'name': 8})
+        self.created = timezone('US/Central').localize(dt.datetime(2014, 6, 1, 12, 30, 15, 120))
+        self.entities = [
+            MyRecordEntity(name=u'caf\xe9', amount=-5, due=dt.date(2014, 6, 2),
+                           created=self.created, seen=dt.datetime(1901, 2, 3, 4, 5, 6)),
+            MyRecordEntity(name='b', paid=True, amount=2 ** 40),
+        ]
+
+    def test_it_should_have_a_fixed_size(self):
+        ensure(self.format.size).equals(1 + (2 + 8) + 8 + 1 + 4 + 10 + 10)
+        for entity in self.entities:
+            ensure(self.format.pack(entity)).has_length(self.format.size)
+
+    def test_it_should_round_trip_entities(self):
+        for entity in self.entities:
+            unpacked = self.format.unpack(self.format.pack(entity))
+            ensure(unpacked).is_a(self.MyRecordEntity)
+            ensure(unpacked).equals(entity)
+        unpacked = self.format.unpack(self.format.pack(self.entities[0]))
+        ensure(unpacked.created.utcoffset()).equals(self.created.utcoffset())
+        ensure(unpacked.seen.tzinfo).is_none()
+
+    def test_it_should_decode_single_fields_from_a_view(self):
+        buf = bytearray(self.format.size * 2)
+        for n, entity in enumerate(self.entities):
+            self.format.pack_into(buf, n * self.format.size, entity)
+
+        view = self.format.view(memoryview(buf), self.format.size)
+        ensure(view.name).equals('b')
+        ensure(view.amount).equals(2 ** 40)
+        ensure(view.paid).is_true()
+        ensure(view['paid']).is_true()
+        ensure(view.due).is_(self.MyRecordEntity.due.default)
+        ensure(view.get('due')).is_none()
+        ensure(view.__getitem__).called_with('due').raises(KeyError)
+        ensure(view.materialize()).equals(self.entities[1])
+
+    def test_it_should_scan_a_memory_mapped_file(self):
+        with tempfile.TemporaryFile() as stream:
+            self.format.write(stream, self.entities * 3)
+            stream.flush()
+            mapped = mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                names = [view.name for view in self.format.scan(mapped)]
+                ensure(names).equals([u'caf\xe9', 'b'] * 3)
+                total = sum(view.amount for view in self.format.scan(mapped))
+                ensure(total).equals((2 ** 40 - 5) * 3)
+            finally:
+                mapped.close()
+
+    def test_it_should_refuse_what_it_cannot_store(self):
+        from nonobvious import entities
+        from nonobvious import fields
+        from nonobvious.records import RecordFormat
+
+        class MyUnpackableEntity(entities.Entity):
+            tags = fields.StringList()
+
+        ensure(RecordFormat).called_with(MyUnpackableEntity).raises(TypeError)
+        ensure(self.format.pack).called_with(self.MyRecordEntity(name='much too long')).raises(ValueError)
+        ensure(self.format.pack).called_with(self.MyRecordEntity(name='a', extra=1)).raises(ValueError)
+        too_big = self.MyRecordEntity(name='a', amount=2 ** 64)
+        ensure(self.format.pack).called_with(too_big).raises(ValueError)
+        buffer = bytearray(self.format.size)
+        ensure(self.format.pack_into).called_with(buffer, 0, too_big).raises(ValueError)
+
+    def test_it_should_store_byte_strings_as_they_are(self):
+        entity = self.MyRecordEntity(name='caf\xc3\xa9')
+        ensure(self.format.unpack(self.format.pack(entity)).name).equals(u'caf\xe9')
+        ensure(self.format.pack).called_with(self.MyRecordEntity(name='caf\xc3\xa9wxyz')).raises(ValueError)
+        ensure(self.format.pack(self.MyRecordEntity(name='caf\xc3\xa9xy'))).equals(
+            self.format.pack(self.MyRecordEntity(name=u'caf\xe9xy')))
+
+    def test_it_should_view_fields_named_like_view_internals(self):
+        from nonobvious import entities
+        from nonobvious import fields
+        from nonobvious.records import RecordFormat
+
+        class MyClashingRecordEntity(entities.Entity):
+            offset = fields.Integer()
+            buffer = fields.Integer()
+            format = fields.String()
+            get = fields.Integer()
+
+        record_format = RecordFormat(MyClashingRecordEntity)
+        entity = MyClashingRecordEntity(offset=1, buffer=2, format='f', get=3)
+        view = record_format.view(record_format.pack(entity))
+        ensure(view.offset).equals(1)
+        ensure(view.buffer).equals(2)
+        ensure(view.format).equals('f')
+        ensure(view['get']).equals(3)
+        ensure(view.get('get')).equals(3)
+        ensure(view.materialize()).equals(entity)
@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+"""tests for compact sequences
+"""
+import pickle
+import unittest
+
+from ensure import ensure
+
+
+class FrozenArrayTests(unittest.TestCase):
+    def test_it_should_be_an_immutable_sequence(self):
+        from collections import Sequence
+        from concon import ConstraintError
+        from nonobvious.sequences import frozenarray
+        values = frozenarray([1, 2, 3])
+        ensure(values).is_a(Sequence)
+        ensure(values).equals([1, 2, 3])
+        ensure(values == (1, 2, 3)).is_true()
+        ensure(values != [1, 2]).is_true()
+        ensure(hash(values)).equals(hash((1, 2, 3)))
+        for name, args in [('append', (4,)), ('extend', ([4],)), ('__setitem__', (0, 4)),
+                           ('pop', ()), ('reverse', ())]:
+            ensure(getattr(values, name)).called_with(*args).raises(ConstraintError)
+        ensure(pickle.loads(pickle.dumps(values, 2))).equals(values)
+        ensure(type(pickle.loads(pickle.dumps(values, 2)))).is_(frozenarray)
+
+    def test_it_should_export_its_buffer_without_copying(self):
+        import numpy
+        from nonobvious.sequences import frozenarray
+        values = frozenarray(range(1000))
+        exported = numpy.frombuffer(values.buffer(), numpy.int_)
+        ensure(exported.tolist()).equals(range(1000))
+        ensure(exported.flags.writeable).is_false()
+        ensure(exported.flags.owndata).is_false()
+
+
+class InternedTupleTests(unittest.TestCase):
+    def test_it_should_share_equal_strings(self):
+        from nonobvious.sequences import internedtuple
+        first = internedtuple([''.join(['a', 'b'])])
+        second = internedtuple([''.join(['a', 'b'])])
+        ensure(first[0]).is_(second[0])
+        ensure(first).equals(['ab'])
+        ensure(first).equals(('ab',))
+        ensure(hash(first)).equals(hash(('ab',)))
+        ensure(pickle.loads(pickle.dumps(first, 2))).is_a(internedtuple)
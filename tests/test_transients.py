@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""tests for transient entity drafts
+"""
+import unittest
+
+from ensure import ensure
+
+
+class TransientTests(unittest.TestCase):
+    def setUp(self):
+        from nonobvious import entities
+        from nonobvious import fields
+
+        def define(base):
+            class MyDraftedEntity(base):
+                name = fields.String(required=True)
+                status = fields.String(default='new')
+                tags = fields.StringList(default=())
+                count = fields.Integer()
+
+            return MyDraftedEntity
+
+        self.MyEntity = define(entities.Entity)
+        self.MyCompactEntity = define(entities.CompactEntity)
+
+    def test_it_should_read_as_the_entity_with_changes_applied(self):
+        entity = self.MyEntity(name='order', count=1)
+        draft = entity.transient()
+        ensure(draft.entity).is_(entity)
+        ensure(dict(draft)).equals(dict(entity))
+
+        draft['status'] = 'shipped'
+        draft.update(tags=['a'], extra=1)
+        del draft['count']
+        ensure(draft['status']).equals('shipped')
+        ensure(draft['tags']).equals(['a'])
+        ensure('count' in draft).is_false()
+        ensure(draft.__getitem__).called_with('count').raises(KeyError)
+        ensure(draft.get('count')).is_none()
+        ensure(sorted(draft)).equals(['extra', 'name', 'status', 'tags'])
+        ensure(draft).has_length(4)
+        ensure(draft.__delitem__).called_with('count').raises(KeyError)
+
+        draft['count'] = 2
+        ensure(draft['count']).equals(2)
+        ensure(entity).equals({'name': 'order', 'status': 'new', 'tags': [], 'count': 1})
+
+    def test_it_should_freeze_into_a_new_validated_entity(self):
+        from concon import frozenlist
+
+        for cls in [self.MyEntity, self.MyCompactEntity]:
+            entity = cls(name='order', count=1)
+            draft = entity.transient()
+            draft['status'] = 'shipped'
+            draft['tags'] = ['a']
+            draft['tags'] = ['a', 'b']
+            result = draft.freeze()
+            ensure(result).is_a(cls)
+            ensure(result).equals({'name': 'order', 'status': 'shipped', 'tags': ['a', 'b'], 'count': 1})
+            ensure(result.tags).is_a(frozenlist)
+            ensure(entity.status).equals('new')
+
+            draft = entity.transient()
+            del draft['count']
+            ensure(draft.freeze()).equals({'name': 'order', 'status': 'new', 'tags': []})
+
+    def test_it_should_return_the_entity_when_unchanged(self):
+        entity = self.MyEntity(name='order')
+        ensure(entity.transient().freeze()).is_(entity)
+
+    def test_it_should_validate_changes_when_frozen(self):
+        entity = self.MyEntity(name='order')
+        draft = entity.transient()
+        draft['count'] = 'one'
+        ensure(draft.freeze).called_with().raises(entity.ValidationError)
+
+        # A failed freeze leaves the draft usable.
+        draft['count'] = 1
+        ensure(draft.freeze().count).equals(1)
+
+        draft = entity.transient()
+        del draft['name']
+        ensure(draft.freeze).called_with().raises(entity.ValidationError)
+
+    def test_it_should_be_unusable_after_freezing(self):
+        entity = self.MyEntity(name='order')
+        draft = entity.transient()
+        draft['count'] = 1
+        draft.freeze()
+        ensure(draft.freeze).called_with().raises(entity.ConstraintError)
+        ensure(draft.__setitem__).called_with('count', 2).raises(entity.ConstraintError)
+        ensure(draft.__getitem__).called_with('count').raises(entity.ConstraintError)
+        ensure(draft.__delitem__).called_with('count').raises(entity.ConstraintError)
+        ensure(draft.update).called_with(count=2).raises(entity.ConstraintError)
+        ensure(list).called_with(draft).raises(entity.ConstraintError)
+        ensure(repr(draft)).equals('Transient(<frozen>)')